@@ -10,8 +10,14 @@ db = SQLAlchemy()
 migrate = Migrate()
 
 def register_extensions(app: Flask):
+    from app.utils import resolve_auth, add_auth_timing
+
     db.init_app(app)
     migrate.init_app(app, db)
+
+    # Before the limiter's own hook, so limits can be keyed by user
+    app.before_request(resolve_auth)
+    app.after_request(add_auth_timing)
     limiter.init_app(app)
 
     swagger_template = {
@@ -34,15 +40,77 @@ def init_services(app: Flask):
     from app.services.auth_service import AccountService
     from app.services.task_service import TaskService
     from app.services.token_service import TokenService
+    from app.services.blacklist_filter import BlacklistFilter
+    from app.services.password_hasher import PasswordHasher
+    from app.services.token_epochs import TokenEpochs
+    from app.services.key_ring import KeyRing
+    from app.cache import LRUCache
+
+    blacklist_filter = None
+    if app.config["BLACKLIST_FILTER_REFRESH_INTERVAL"] > 0:
+        blacklist_filter = BlacklistFilter(
+            refresh_interval=app.config["BLACKLIST_FILTER_REFRESH_INTERVAL"],
+            full_reload_interval=app.config["BLACKLIST_FILTER_RELOAD_INTERVAL"],
+        )
+
+    claims_cache = None
+    if app.config["TOKEN_CLAIMS_CACHE_MAX_ENTRIES"] > 0:
+        claims_cache = LRUCache(
+            max_entries=app.config["TOKEN_CLAIMS_CACHE_MAX_ENTRIES"]
+        )
+
+    token_epochs = None
+    if app.config["TOKEN_EPOCHS_REFRESH_INTERVAL"] > 0:
+        token_epochs = TokenEpochs(
+            refresh_interval=app.config["TOKEN_EPOCHS_REFRESH_INTERVAL"]
+        )
+
+    access_keys = None
+    if app.config["JWT_ALGORITHM"] != "HS256":
+        access_keys = KeyRing.from_directory(
+            app.config["JWT_KEYS_DIR"],
+            app.config["JWT_ALGORITHM"],
+            app.config["JWT_ACTIVE_KID"],
+        )
 
     token_service = TokenService(
         db.session,
         app.config["ACCESS_TOKEN_SECRET"],
         app.config["REFRESH_TOKEN_SECRET"],
+        blacklist_filter=blacklist_filter,
+        claims_cache=claims_cache,
+        token_epochs=token_epochs,
+        access_keys=access_keys,
     )
 
-    account_service = AccountService(db_session=db.session)
-    task_service = TaskService(session=db.session)
+    password_hasher = PasswordHasher(
+        method=app.config["PASSWORD_HASH_METHOD"],
+        workers=app.config["PASSWORD_HASH_WORKERS"],
+    )
+    account_service = AccountService(
+        db_session=db.session,
+        password_hasher=password_hasher,
+    )
+    listing_cache = None
+    if app.config["TASK_LISTING_CACHE_MAX_ENTRIES"] > 0:
+        listing_cache = LRUCache(
+            max_entries=app.config["TASK_LISTING_CACHE_MAX_ENTRIES"],
+            ttl=app.config["TASK_LISTING_CACHE_TTL"],
+            max_bytes=app.config["TASK_LISTING_CACHE_MAX_BYTES"],
+        )
+
+    tag_cache = None
+    if app.config["TAG_CACHE_MAX_ENTRIES"] > 0:
+        tag_cache = LRUCache(
+            max_entries=app.config["TAG_CACHE_MAX_ENTRIES"],
+            ttl=app.config["TAG_CACHE_TTL"],
+        )
+
+    task_service = TaskService(
+        session=db.session,
+        listing_cache=listing_cache,
+        tag_cache=tag_cache,
+    )
 
     app.token_service = token_service
     app.account_service = account_service
@@ -51,9 +119,17 @@ def init_services(app: Flask):
 def register_blueprints(app: Flask):
     from app.routes.auth_routes import auth_bp
     from app.routes.task_routes import todo_bp
+    from app.routes.tag_routes import tag_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(todo_bp)
+    app.register_blueprint(tag_bp)
+
+
+def register_commands(app: Flask):
+    from app.commands import purge_blacklist
+
+    app.cli.add_command(purge_blacklist)
 
 
 def create_app(config_class='app.config.Config') -> Flask:
@@ -63,6 +139,7 @@ def create_app(config_class='app.config.Config') -> Flask:
     register_extensions(app)
     register_blueprints(app)
     init_services(app)
+    register_commands(app)
     set_error_handlers(app)
 
     return app
\ No newline at end of file
@@ -0,0 +1,152 @@
+"""
+Bounded in-process caches
+"""
+from collections import OrderedDict
+import sys
+import threading
+import time
+
+_MISSING = object()
+
+
+def approximate_size(value) -> int:
+    """
+    Returns a rough estimate, in bytes, of the memory held by value and
+    the containers and strings inside it
+    """
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        for key, item in value.items():
+            size += approximate_size(key) + approximate_size(item)
+
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += approximate_size(item)
+
+    return size
+
+
+class LRUCache():
+    """
+    Thread-safe least recently used cache, bounded by number of entries and
+    optionally by approximate size in bytes, with optional expiration.
+
+    Entries can belong to a group (e.g. a user id), so that every entry of
+    the group can be invalidated at once.
+
+    Args:
+        - max_entries (int): maximum number of entries kept
+        - ttl (float): default seconds an entry lives, None for no expiration
+        - max_bytes (int): maximum approximate size of all values, None for
+          no limit
+        - sizeof (callable): estimates the size of a value in bytes
+    """
+    def __init__(self, max_entries: int, ttl: float = None,
+                 max_bytes: int = None, sizeof=approximate_size):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        # key -> (value, expires_at, size, group)
+        self._entries = OrderedDict()
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key) -> None:
+        _, _, size, group = self._entries.pop(key)
+        self._bytes -= size
+
+        if group is not None:
+            keys = self._groups[group]
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def get(self, key, default=None):
+        """Returns the value cached for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return default
+
+            if entry[1] is not None and entry[1] <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl: float = _MISSING, group=None) -> None:
+        """
+        Caches value for key, evicting the least recently used entries
+        while the cache is over its limits
+
+        Args:
+            - ttl (float): seconds the entry lives, overriding the default
+            - group: group the entry belongs to
+        """
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+
+        if self.max_entries < 1 or (
+            self.max_bytes is not None and size > self.max_bytes
+        ):
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, expires_at, size, group)
+            self._bytes += size
+
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate_group(self, group) -> None:
+        """Removes every entry cached with the given group"""
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
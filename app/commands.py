@@ -0,0 +1,12 @@
+# app/commands.py
+from flask import current_app
+import click
+
+
+@click.command("purge-blacklist")
+@click.option("--batch-size", default=1000, show_default=True,
+              help="Expired tokens deleted per transaction")
+def purge_blacklist(batch_size: int) -> None:
+    """Remove expired tokens from the blacklist (meant to run from cron)"""
+    deleted = current_app.token_service.cleanup_blacklist(batch_size)
+    click.echo(f"Removed {deleted} expired blacklisted tokens")
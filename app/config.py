@@ -6,7 +6,44 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     ACCESS_TOKEN_SECRET = os.environ.get('ACCESS_TOKEN_SECRET') or 'acc_token_secret'
     REFRESH_TOKEN_SECRET = os.environ.get('ACCESS_TOKEN_SECRET') or 'rfs_token_secret'
+    # Access tokens are signed with HS256 and ACCESS_TOKEN_SECRET, or with
+    # EdDSA or ES256 and the key JWT_ACTIVE_KID among the <kid>.pem files
+    # of JWT_KEYS_DIR, whose public keys are served at /.well-known/jwks.json
+    JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM') or 'HS256'
+    JWT_KEYS_DIR = os.environ.get('JWT_KEYS_DIR')
+    JWT_ACTIVE_KID = os.environ.get('JWT_ACTIVE_KID')
+    # Rate limit counters are per process with memory://. Set to e.g.
+    # sqlite:////var/lib/todo/ratelimits.db to share them between the worker
+    # processes of a host and keep them across restarts
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or 'memory://'
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY') or 'sliding-window-counter'
+    # Counting stops here when GET /todos is asked for an estimated total
+    ESTIMATED_TOTAL_CAP = int(os.environ.get('ESTIMATED_TOTAL_CAP') or 1000)
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS') or 100)
+    # Task listings cached per process, 0 entries disables the cache
+    TASK_LISTING_CACHE_MAX_ENTRIES = int(os.environ.get('TASK_LISTING_CACHE_MAX_ENTRIES') or 1024)
+    TASK_LISTING_CACHE_TTL = float(os.environ.get('TASK_LISTING_CACHE_TTL') or 300)
+    TASK_LISTING_CACHE_MAX_BYTES = int(os.environ.get('TASK_LISTING_CACHE_MAX_BYTES') or 32 * 1024 * 1024)
+    # Tag name -> id lookups cached per process, 0 entries disables the cache
+    TAG_CACHE_MAX_ENTRIES = int(os.environ.get('TAG_CACHE_MAX_ENTRIES') or 10000)
+    TAG_CACHE_TTL = float(os.environ.get('TAG_CACHE_TTL') or 3600)
+    # Seconds before tokens blacklisted by other processes are seen by the
+    # in-memory blacklist filter, 0 disables the filter
+    BLACKLIST_FILTER_REFRESH_INTERVAL = float(os.environ.get('BLACKLIST_FILTER_REFRESH_INTERVAL') or 5)
+    BLACKLIST_FILTER_RELOAD_INTERVAL = float(os.environ.get('BLACKLIST_FILTER_RELOAD_INTERVAL') or 300)
+    # Verified token claims cached per process until the token expires,
+    # 0 entries disables the cache
+    TOKEN_CLAIMS_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CLAIMS_CACHE_MAX_ENTRIES') or 10000)
+    # Seconds before tokens revoked all at once by other processes are
+    # rejected by this one, 0 disables revoking all tokens of a user
+    TOKEN_EPOCHS_REFRESH_INTERVAL = float(os.environ.get('TOKEN_EPOCHS_REFRESH_INTERVAL') or 5)
+    # werkzeug password hashing method and cost, e.g. "scrypt" or
+    # "pbkdf2:sha256:600000". Stored hashes made otherwise are upgraded on login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt'
+    # Processes hashing passwords, 0 hashes on the request thread
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
 
 class TestConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     TESTING = True
+    PASSWORD_HASH_WORKERS = 0
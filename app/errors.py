@@ -31,10 +31,18 @@ class TaskNotFound(ServiceError):
     message = "Task not found"
     status_code = 404
 
+class PreconditionFailed(ServiceError):
+    message = "Task was modified since it was read"
+    status_code = 412
+
 class TitleEmpty(ServiceError):
     message = "Title cannot be empty"
     status_code = 400
 
 class UserNotFound(ServiceError):
     message = "User does not exist"
-    status_code = 404
\ No newline at end of file
+    status_code = 404
+
+class FeatureDisabled(ServiceError):
+    message = "This feature is not enabled on this server"
+    status_code = 501
\ No newline at end of file
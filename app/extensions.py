@@ -1,13 +1,25 @@
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask import g
+# Registers the sqlite:// storage scheme
+from . import rate_limit_storage
 
 def rate_limit_key():
-    return str(g.get("user_id", get_remote_address()))
+    """
+    Limits authenticated requests per user (set on g by resolve_auth) and
+    the others per remote address
+    """
+    user_id = g.get("user_id")
 
+    if user_id is not None:
+        return f"user:{user_id}"
+
+    return get_remote_address()
+
+# Storage and strategy come from RATELIMIT_STORAGE_URI and
+# RATELIMIT_STRATEGY in the app config
 limiter = Limiter(
     rate_limit_key,
     default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://"
 )
 
@@ -1,3 +1,4 @@
 from .user import User
-from .task import Task
-from .blacklisted_token import BlacklistedToken
\ No newline at end of file
+from .task import Task, TaskTombstone
+from .blacklisted_token import BlacklistedToken
+from .token_epoch import TokenEpoch
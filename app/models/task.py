@@ -1,7 +1,8 @@
-from sqlalchemy import ForeignKey, Enum as SQLEnum
+from sqlalchemy import DDL, ForeignKey, Index, Enum as SQLEnum, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app import db
 from app.models import User
+from datetime import datetime, timezone
 from enum import Enum
 
 class TaskStatus(str, Enum):
@@ -9,17 +10,32 @@ class TaskStatus(str, Enum):
     DOING = "doing"
     DONE = "done"
 
+# Fields of a task as returned by the API
+TASK_FIELDS = ("id", "title", "description", "status", "tags")
+
+# Orderings accepted when listing tasks, "-" meaning descending
+TASK_SORTS = ("id", "-id", "title", "-title", "status", "-status")
+
 task_tags = db.Table(
     "task_tags",
     db.Column("task_id", ForeignKey("tasks.id"), primary_key=True),
     db.Column("tag_id", ForeignKey("tags.id"), primary_key=True),
+    # The primary key serves task -> tags, this one serves tag -> tasks
+    Index("ix_task_tags_tag_id_task_id", "tag_id", "task_id"),
 )
 
 class Task(db.Model):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Keyset pages of a user's tasks seek through these, by id or title
+        Index("ix_tasks_user_id_id", "user_id", "id"),
+        Index("ix_tasks_user_id_title_id", "user_id", "title", "id"),
+        Index("ix_tasks_user_id_status_id", "user_id", "status", "id"),
+        Index("ix_tasks_user_id_revision", "user_id", "revision"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     title: Mapped[str] = mapped_column(nullable=False)
     description: Mapped[str] = mapped_column(nullable=True)
     
@@ -29,6 +45,13 @@ class Task(db.Model):
         default=TaskStatus.TODO
     )
 
+    # Value of the owner's task_version after the last write to the task
+    revision: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(
+        nullable=True,
+        default=lambda: datetime.now(tz=timezone.utc)
+    )
+
     user: Mapped["User"] = relationship(back_populates="tasks")
 
     tags: Mapped[list["Tag"]] = relationship(
@@ -37,12 +60,21 @@ class Task(db.Model):
         backref="tasks"
     )
 
-    def to_dict(self) -> dict:
+    def to_dict(self, tags: list[str] = None) -> dict:
+        """
+        Returns the task as returned by the API. tags can be given when
+        they were already loaded for several tasks at once, otherwise they
+        are read through the tags relationship
+        """
+        if tags is None:
+            tags = sorted(tag.name for tag in self.tags)
+
         return {
             "id": self.id,
             "title": self.title,
             "description": self.description,
-            "status": self.status.value
+            "status": self.status.value,
+            "tags": tags
         }
 
     def __init__(self, user_id: int, title: str, description: str = ""):
@@ -50,3 +82,86 @@ class Task(db.Model):
         self.title = title
         self.description = description
         self.status = TaskStatus.TODO
+
+
+class TaskTombstone(db.Model):
+    """Record of a deleted task, kept so clients can sync the deletion"""
+    __tablename__ = "task_tombstones"
+    __table_args__ = (
+        Index("ix_task_tombstones_user_id_revision", "user_id", "revision"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    task_id: Mapped[int] = mapped_column(nullable=False)
+    user_id: Mapped[int] = mapped_column(nullable=False)
+    revision: Mapped[int] = mapped_column(nullable=False)
+    deleted_at: Mapped[datetime] = mapped_column(nullable=False)
+
+
+# Full-text search index over title and description. On SQLite it is an
+# external content FTS5 table kept in sync by triggers, on PostgreSQL a
+# generated tsvector column with a GIN index. Either way every write to
+# tasks updates it, whichever code path it comes from.
+# user_id is indexed in tasks_fts too, so a search is narrowed to the
+# tasks of one user by the inverted index itself.
+SQLITE_SEARCH_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, user_id,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts (rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_update
+    AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+        INSERT INTO tasks_fts (rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END
+    """,
+)
+
+POSTGRESQL_SEARCH_DDL = (
+    """
+    ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_tasks_search_vector
+    ON tasks USING GIN (search_vector)
+    """,
+)
+
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(
+        Task.__table__, "after_create",
+        DDL(statement).execute_if(dialect="sqlite")
+    )
+
+for statement in POSTGRESQL_SEARCH_DDL:
+    event.listen(
+        Task.__table__, "after_create",
+        DDL(statement).execute_if(dialect="postgresql")
+    )
+
+event.listen(
+    Task.__table__, "before_drop",
+    DDL("DROP TABLE IF EXISTS tasks_fts").execute_if(dialect="sqlite")
+)
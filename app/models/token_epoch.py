@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from app import db
+from datetime import datetime
+
+class TokenEpoch(db.Model):
+    """
+    Generation of the tokens of a user. Tokens issued with a lower "gen"
+    claim are revoked. Not a foreign key of users, so that the tokens of a
+    deleted user stay revoked
+    """
+    __tablename__ = "token_epochs"
+
+    user_id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    epoch: Mapped[int] = mapped_column(nullable=False, default=0)
+    # Serves the incremental refresh of the in-memory epochs
+    changed_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<TokenEpoch {self.user_id}: {self.epoch}>'
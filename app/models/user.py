@@ -11,6 +11,8 @@ class User(db.Model):
     name: Mapped[str] = mapped_column(nullable=False)
     email: Mapped[str] = mapped_column(nullable=False, unique=True)
     password: Mapped[str] = mapped_column(nullable=False)
+    # Bumped by every write to the user's tasks, used to validate caches
+    task_version: Mapped[int] = mapped_column(nullable=False, default=0, server_default="0")
 
     tasks: Mapped[list["Task"]] = relationship(back_populates="user", cascade="all, delete-orphan")
 
@@ -22,10 +24,11 @@ class User(db.Model):
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password, password)
 
-    def __init__(self, name, email, password):
+    def __init__(self, name, email, password=None, password_hash=None):
         if not User.is_email_valid(email):
             raise ValueError("Invalid Email")
         
         self.name = name 
         self.email = email
-        self.password = generate_password_hash(password)
+        # password_hash is given when hashing was done elsewhere
+        self.password = password_hash or generate_password_hash(password)
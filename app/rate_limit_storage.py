@@ -0,0 +1,191 @@
+"""
+Rate limit storage shared by every worker process of a host
+"""
+from limits.storage.base import (
+    SlidingWindowCounterSupport,
+    Storage,
+    TimestampedSlidingWindow,
+)
+from math import floor
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """
+    Flask-Limiter storage keeping counters in a SQLite database in WAL mode,
+    so every process of a host shares the same limits and they survive
+    restarts without an outside service. Selected with a storage URI like
+    sqlite:///ratelimits.db (relative) or sqlite:////var/lib/app/ratelimits.db.
+
+    Each key is a single row (two for the sliding window counter strategy),
+    updated with one atomic upsert, so memory is constant per key and the
+    only lock is SQLite's own, held for one statement. Expired rows are
+    deleted every purge_interval seconds.
+
+    Args:
+        - uri (str): storage URI with the database path
+        - timeout (float): seconds to wait for the database lock
+        - purge_interval (float): seconds between purges of expired rows
+    """
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str = None, wrap_exceptions: bool = False,
+                 timeout: float = 5, purge_interval: float = 60, **options):
+        self.path = uri[len("sqlite:///"):]
+        self.timeout = float(timeout)
+        self.purge_interval = float(purge_interval)
+
+        # Connections are per thread and reopened after a fork
+        self._local = threading.local()
+        self._purged_at = time.monotonic()
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
+
+    def _purge(self, connection: sqlite3.Connection, now: float) -> None:
+        if time.monotonic() - self._purged_at >= self.purge_interval:
+            self._purged_at = time.monotonic()
+            connection.execute(
+                "DELETE FROM rate_limits WHERE expires_at <= ?", (now,)
+            )
+
+    def _incr(self, connection: sqlite3.Connection, key: str, expiry: float,
+              amount: int, now: float) -> int:
+        # An expired counter starts over, as if it had been deleted
+        return connection.execute("""
+            INSERT INTO rate_limits (key, count, expires_at)
+            VALUES (:key, :amount, :expires_at)
+            ON CONFLICT (key) DO UPDATE SET
+                count = CASE WHEN expires_at <= :now
+                        THEN excluded.count ELSE count + excluded.count END,
+                expires_at = CASE WHEN expires_at <= :now
+                             THEN excluded.expires_at ELSE expires_at END
+            RETURNING count
+        """, {
+            "key": key,
+            "amount": amount,
+            "expires_at": now + expiry,
+            "now": now
+        }).fetchone()[0]
+
+    def _get(self, connection: sqlite3.Connection, key: str, now: float) -> int:
+        row = connection.execute(
+            "SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?",
+            (key, now)
+        ).fetchone()
+
+        return row[0] if row else 0
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        connection = self._connection()
+        now = time.time()
+        self._purge(connection, now)
+
+        return self._incr(connection, key, expiry, amount, now)
+
+    def get(self, key: str) -> int:
+        return self._get(self._connection(), key, time.time())
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = self._connection().execute(
+            "SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?",
+            (key, now)
+        ).fetchone()
+
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        return self._connection().execute("DELETE FROM rate_limits").rowcount
+
+    def clear(self, key: str) -> None:
+        self._connection().execute("DELETE FROM rate_limits WHERE key = ?", (key,))
+
+    def _sliding_window(self, connection: sqlite3.Connection, key: str,
+                        expiry: int, now: float) -> tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._get(connection, previous_key, now)
+        current_count = self._get(connection, current_key, now)
+
+        previous_ttl = 0.0
+        if previous_count:
+            previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry
+
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int,
+                                     amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+
+        connection = self._connection()
+        now = time.time()
+        self._purge(connection, now)
+
+        # The check and the increment are one write transaction, so
+        # concurrent processes can never both take the last entry
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            previous_count, previous_ttl, current_count, _ = \
+                self._sliding_window(connection, key, expiry, now)
+            weighted_count = previous_count * previous_ttl / expiry + current_count
+
+            acquired = floor(weighted_count) + amount <= limit
+            if acquired:
+                _, current_key = self.sliding_window_keys(key, expiry, now)
+                # Lives two windows, as it is the previous one in the next
+                self._incr(connection, current_key, 2 * expiry, amount, now)
+
+            connection.execute("COMMIT")
+            return acquired
+
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get_sliding_window(self, key: str,
+                           expiry: int) -> tuple[int, float, int, float]:
+        return self._sliding_window(self._connection(), key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        for window_key in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(window_key)
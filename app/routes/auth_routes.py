@@ -269,6 +269,79 @@ def logout() -> tuple[Response, int]:
     }), 200
 
 
+@auth_bp.route('/logout-all', methods=['POST'])
+@limiter.limit("5 per minute")
+@login_required
+def logout_all(user_id: int) -> tuple[Response, int]:
+    """
+    Log out from every device: revoke all access and refresh tokens issued so far
+    ---
+    tags:
+      - Auth
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+    responses:
+      200:
+        description: Successful logout from every device
+        schema:
+          type: object
+          properties:
+            message:
+              type: string
+              example: "Logged out from all devices"
+
+      401:
+        description: Unauthorized due to invalid, missing or expired token
+
+      501:
+        description: Revoking all tokens is not enabled (TOKEN_EPOCHS_REFRESH_INTERVAL is 0)
+        schema:
+          type: object
+          properties:
+            message:
+              type: string
+              example: "Revoking all tokens is not enabled"
+    """
+    current_app.token_service.revoke_all_tokens(user_id)
+
+    return jsonify({
+        "message": "Logged out from all devices"
+    }), 200
+
+
+@auth_bp.route('/.well-known/jwks.json', methods=['GET'])
+def jwks() -> tuple[Response, int]:
+    """
+    Public keys that verify access tokens, as a JSON Web Key Set
+    ---
+    tags:
+      - Auth
+    responses:
+      200:
+        description: >
+          Keys indexed by the kid header of access tokens. Empty when access
+          tokens are signed with a shared secret
+        schema:
+          type: object
+          properties:
+            keys:
+              type: array
+              items:
+                type: object
+    """
+    access_keys = current_app.token_service.access_keys
+    response = jsonify(access_keys.jwks() if access_keys else {"keys": []})
+    response.headers["Cache-Control"] = "public, max-age=300"
+
+    return response, 200
+
+
 @auth_bp.route('/user', methods=['DELETE'])
 @limiter.limit("5 per minute")
 @require_json_fields({"password"})
@@ -317,5 +390,10 @@ def delete(user_id: int):
     """
     service = current_app.account_service
     service.delete_self(user_id, request.get_json().get("password"))
+    current_app.task_service.forget_user(user_id)
+
+    token_service = current_app.token_service
+    if token_service.token_epochs is not None:
+        token_service.revoke_all_tokens(user_id)
 
     return "", 204
\ No newline at end of file
@@ -0,0 +1,122 @@
+# app/routes/tag_routes.py
+from flask import Blueprint, request, Response, jsonify, current_app
+from app.utils import limit_requests, login_required
+from app.utils import validate_suggest_parameters
+
+tag_bp = Blueprint('tags', __name__)
+
+SUGGEST_MAX_LIMIT = 50
+
+
+@tag_bp.route('/tags', methods=['GET'])
+@limit_requests("500 per hour")
+@login_required
+def get_tags(user_id: int) -> tuple[Response, int]:
+    """
+    List tags of the user with the number of todos using each
+    ---
+    tags:
+      - Tags
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+    responses:
+      200:
+        description: Tags of the user, most used first
+        schema:
+          type: object
+          properties:
+            data:
+              type: array
+              items:
+                type: object
+                properties:
+                  name:
+                    type: string
+                    example: "work"
+                  count:
+                    type: integer
+                    example: 3
+      401:
+        description: Unauthorized (invalid or missing token)
+    """
+    tags = current_app.task_service.tags_by_user_id(user_id)
+
+    return jsonify({"data": tags}), 200
+
+
+@tag_bp.route('/tags/suggest', methods=['GET'])
+@limit_requests("3000 per hour")
+@login_required
+def suggest_tags(user_id: int) -> tuple[Response, int]:
+    """
+    Suggest tags of the user starting with a prefix, for autocomplete
+    ---
+    tags:
+      - Tags
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+      - name: prefix
+        in: query
+        description: Start of the tag name typed by the user
+        required: true
+        schema:
+          type: string
+          example: "wo"
+
+      - name: limit
+        in: query
+        description: Maximum number of suggestions (up to 50)
+        required: false
+        schema:
+          type: integer
+          example: 10
+
+    responses:
+      200:
+        description: Matching tags, most used first
+        schema:
+          type: object
+          properties:
+            data:
+              type: array
+              items:
+                type: object
+                properties:
+                  name:
+                    type: string
+                    example: "work"
+                  count:
+                    type: integer
+                    example: 3
+      400:
+        description: Bad request due to invalid query parameters
+      401:
+        description: Unauthorized (invalid or missing token)
+    """
+    valid_query, errors = validate_suggest_parameters(SUGGEST_MAX_LIMIT)
+
+    if not valid_query:
+        return jsonify({
+            "message": "Invalid request",
+            "errors": errors
+        }), 400
+
+    tags = current_app.task_service.suggest_tags(
+        user_id,
+        request.args["prefix"],
+        int(request.args.get("limit", 10))
+    )
+
+    return jsonify({"data": tags}), 200
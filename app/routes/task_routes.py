@@ -1,11 +1,41 @@
 # app/routes/task_routes.py
 from flask import Blueprint, request, Response, jsonify, current_app
+from flask import stream_with_context
 from app.utils import require_json_fields, validate_query_parameters
+from app.utils import validate_search_parameters, iter_ndjson, iter_json_array
 from app.utils import limit_requests, login_required
+from app.utils import encode_cursor, decode_cursor, parse_fields
+from app.models.task import TASK_FIELDS
+import csv
+import hashlib
+import io
+import json
 
 todo_bp = Blueprint('todos', __name__)
 
 
+def _task_response(task: dict, status: int) -> tuple[Response, int]:
+    """
+    Returns a single task response, with the revision of the task (popped
+    from it) as ETag
+    """
+    revision = task.pop("revision")
+    response = jsonify(task)
+    response.set_etag(str(revision))
+    return response, status
+
+
+def _if_match_revisions() -> list[int]:
+    """
+    Returns the task revisions accepted by the If-Match header, or None
+    when any revision is (no header or *)
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+
+    return [int(etag) for etag in request.if_match if etag.isdigit()]
+
+
 @todo_bp.route('/todos', methods=['POST'])
 @limit_requests("50 per hour")
 @require_json_fields(required={"title", "description"})
@@ -53,6 +83,14 @@ def create_todo(user_id: int) -> tuple[Response, int]:
             description:
               type: string
               example: "Buy milk, eggs, and bread"
+            status:
+              type: string
+              example: "todo"
+            tags:
+              type: array
+              items:
+                type: string
+              example: []
 
       400:
         description: Bad request due to missing or invalid data
@@ -66,13 +104,15 @@ def create_todo(user_id: int) -> tuple[Response, int]:
     task_service = current_app.task_service
     data = request.get_json()
 
-    created_item = task_service.create_task(
+    created_task = task_service.create_task(
         user_id,
         data["title"],
         data["description"],
-    ).to_dict()
+    )
 
-    return jsonify(created_item), 201
+    return _task_response(
+        {**created_task.to_dict(), "revision": created_task.revision}, 201
+    )
 
 
 @todo_bp.route("/todos/<int:id>", methods=['PATCH'])
@@ -118,15 +158,25 @@ def update_task(user_id: int, id: int) -> tuple[Response, int]:
               type: string
               example: "done"
 
+      - name: If-Match
+        in: header
+        description: >
+          ETag of the to do item as last read. The update only happens if
+          the item was not modified since
+        required: false
+        type: string
+
     responses:
       204:
-        description: To do item updated successfully.
+        description: To do item updated successfully. The ETag header holds its new version
       400:
         description: Bad request due to missing or invalid data
       403:
         description: User has no permission to access the resource
       404:
         description: Resource was not found
+      412:
+        description: To do item was modified since the If-Match ETag
     """
 
     task_service = current_app.task_service
@@ -134,10 +184,51 @@ def update_task(user_id: int, id: int) -> tuple[Response, int]:
     updated_data = task_service.update_task(
         user_id,
         id,
-        request.get_json()
+        request.get_json(),
+        if_revisions=_if_match_revisions()
     )
 
-    return jsonify(updated_data), 204
+    return _task_response(updated_data, 204)
+
+
+@todo_bp.route("/todos/<int:id>", methods=['GET'])
+@limit_requests("500 per hour")
+@login_required
+def get_task(user_id: int, id: int) -> tuple[Response, int]:
+    """
+    Get a single task
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+      - name: id
+        in: path
+        description: ID of the to do item
+        required: true
+        schema:
+          type: integer
+          example: 1
+
+    responses:
+      200:
+        description: >
+          The to do item, with its version as ETag, to be sent back as
+          If-Match when updating it
+      403:
+        description: User has no permission to access the resource
+      404:
+        description: Resource was not found
+    """
+    task = current_app.task_service.get_user_task(user_id, id)
+
+    return _task_response(task, 200)
 
 
 @todo_bp.route('/todos/<int:id>', methods=['DELETE'])
@@ -212,9 +303,80 @@ def get_tasks(user_id: int) -> tuple[Response, int]:
           type: integer
           example: 10
 
+      - name: cursor
+        in: query
+        description: >
+          Opaque cursor returned as next_cursor by a previous request.
+          Continues the listing right after the last item already received
+          and cannot be combined with page
+        required: false
+        schema:
+          type: string
+
+      - name: include_total
+        in: query
+        description: >
+          "true" returns the exact total, "false" skips counting and
+          "estimated" counts up to a cap and flags the total as estimated
+          once the cap is reached. Defaults to "true" for page-based
+          requests and "false" for cursor-based requests
+        required: false
+        schema:
+          type: string
+          enum: ["true", "false", "estimated"]
+
+      - name: fields
+        in: query
+        description: >
+          Comma separated task fields to return (id, title, description,
+          status, tags). id is always returned
+        required: false
+        schema:
+          type: string
+          example: "id,title,status"
+
+      - name: status
+        in: query
+        description: Only return tasks with this status
+        required: false
+        schema:
+          type: string
+          enum: ["todo", "doing", "done"]
+
+      - name: tag
+        in: query
+        description: Only return tasks with this tag
+        required: false
+        schema:
+          type: string
+          example: "work"
+
+      - name: sort
+        in: query
+        description: >
+          Field to order by (id, title or status), prefixed with "-" for
+          descending order. Cursors are only valid for the sort they were
+          created with
+        required: false
+        schema:
+          type: string
+          example: "-title"
+
+      - name: If-None-Match
+        in: header
+        description: ETag of a previous response to the same request
+        required: false
+        type: string
+
     responses:
       200:
-        description: A paginated list of todos
+        description: >
+          A paginated list of todos with has_more and next_cursor.
+          Page-based requests also include page, and total is included
+          unless include_total is "false". The ETag header changes
+          whenever any todo of the user changes
+      304:
+        description: Todos did not change since the response with If-None-Match ETag
       400:
         description: Bad request due to invalid query parameters
     """
@@ -228,17 +390,539 @@ def get_tasks(user_id: int) -> tuple[Response, int]:
             "errors": errors
         }), 400
 
-    page = int(request.args.get("page", 1))
+    # Any write to the user's tasks bumps the version, so the ETag of a
+    # listing can be checked without running the listing queries
+    version = task_service.task_version(user_id)
+    query_digest = hashlib.sha256(request.query_string).hexdigest()[:16]
+    etag = f"{user_id}-{version}-{query_digest}"
+
+    if request.if_none_match.contains(etag):
+        not_modified = Response(status=304)
+        not_modified.set_etag(etag)
+        not_modified.headers["Cache-Control"] = "private, no-cache"
+        return not_modified, 304
+
+    limit = int(request.args.get("limit", 10))
+    fields = parse_fields(request.args.get("fields", ",".join(TASK_FIELDS)))
+    sort = request.args.get("sort", "id")
+    filters = {
+        "status": request.args.get("status"),
+        "tag": request.args.get("tag")
+    }
+    cursor_mode = "cursor" in request.args
+    total_mode = request.args.get(
+        "include_total",
+        "false" if cursor_mode else "true"
+    )
+
+    # The next cursor needs the sort field even if it was not requested
+    sort_field = sort.lstrip("-")
+    query_fields = fields
+    if sort_field != "id" and sort_field not in fields:
+        query_fields = (*fields, sort_field)
+
+    if cursor_mode:
+        after_id, after_key = decode_cursor(request.args["cursor"], sort)
+
+        # One extra row tells whether there is a next page
+        tasks = task_service.tasks_after_id(
+            user_id, after_id, limit + 1, fields=query_fields,
+            sort=sort, after_key=after_key, version=version, **filters
+        )
+        has_more = len(tasks) > limit
+        tasks = tasks[:limit]
+        response = {}
+
+    else:
+        page = int(request.args.get("page", 1))
+        response = {"page": page}
+
+        if total_mode == "true":
+            tasks, total = task_service.tasks_and_total_by_user_id(
+                user_id, page, limit, fields=query_fields, sort=sort,
+                version=version, **filters
+            )
+            has_more = page * limit < total
+        else:
+            tasks = task_service.tasks_by_user_id(
+                user_id, page, limit, lookahead=1, fields=query_fields,
+                sort=sort, version=version, **filters
+            )
+            has_more = len(tasks) > limit
+            tasks = tasks[:limit]
+
+    if total_mode == "true":
+        if cursor_mode:
+            total = task_service.count_tasks_by_user_id(
+                user_id, version=version, **filters
+            )
+        response["total"] = total
+
+    elif total_mode == "estimated":
+        cap = current_app.config["ESTIMATED_TOTAL_CAP"]
+        total = task_service.count_tasks_by_user_id(
+            user_id, cap=cap, version=version, **filters
+        )
+        response["total"] = total
+        response["total_estimated"] = total >= cap
+
+    next_cursor = None
+    if has_more and tasks:
+        last = tasks[-1]
+        next_cursor = encode_cursor(last["id"], sort, last[sort_field])
+
+    if query_fields is not fields:
+        for task in tasks:
+            del task[sort_field]
+
+    listing = jsonify({
+        "data": tasks,
+        **response,
+        "limit": limit,
+        "has_more": next_cursor is not None,
+        "next_cursor": next_cursor
+    })
+    listing.set_etag(etag)
+    listing.headers["Cache-Control"] = "private, no-cache"
+
+    return listing, 200
+
+
+@todo_bp.route('/todos/search', methods=['GET'])
+@limit_requests("500 per hour")
+@login_required
+def search_tasks(user_id: int) -> tuple[Response, int]:
+    """
+    Search todos by title and description
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+      - name: q
+        in: query
+        description: >
+          Words to search for. Tasks must match all of them, the last one
+          also matching as a prefix
+        required: true
+        schema:
+          type: string
+          example: "buy gro"
+
+      - name: limit
+        in: query
+        description: Number of items per page
+        required: false
+        schema:
+          type: integer
+          example: 10
+
+      - name: cursor
+        in: query
+        description: >
+          Opaque cursor returned as next_cursor by a previous search. Pages
+          are ordered by rank, which is not stable: on SQLite it depends on
+          every user's tasks, so writes between two pages may make a task
+          be skipped or repeated
+        required: false
+        schema:
+          type: string
+
+    responses:
+      200:
+        description: Matching todos, best matches first
+      400:
+        description: Bad request due to invalid query parameters
+    """
+    task_service = current_app.task_service
+
+    valid_query, errors = validate_search_parameters()
+
+    if not valid_query:
+        return jsonify({
+            "message": "Invalid request",
+            "errors": errors
+        }), 400
+
     limit = int(request.args.get("limit", 10))
+    after_id, after_rank = None, None
 
-    tasks = task_service.tasks_by_user_id(user_id, page, limit)
-    total = task_service.count_tasks_by_user_id(user_id)
+    if "cursor" in request.args:
+        after_id, after_rank = decode_cursor(request.args["cursor"], "rank")
 
-    data_in_dict = [task.to_dict() for task in tasks]
+    # One extra row tells whether there is a next page
+    tasks = task_service.search_tasks(
+        user_id,
+        request.args["q"],
+        limit + 1,
+        after_id=after_id,
+        after_rank=after_rank
+    )
+    has_more = len(tasks) > limit
+    tasks = tasks[:limit]
+
+    next_cursor = None
+    if has_more:
+        next_cursor = encode_cursor(tasks[-1]["id"], "rank", tasks[-1]["rank"])
+
+    for task in tasks:
+        del task["rank"]
 
     return jsonify({
-        "data": data_in_dict,
-        "page": page,
+        "data": tasks,
         "limit": limit,
-        "total": total
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }), 200
+
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+
+def _ndjson_lines(tasks):
+    for task in tasks:
+        yield json.dumps(task) + "\n"
+
+
+def _csv_lines(tasks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(TASK_FIELDS)
+
+    for task in tasks:
+        writer.writerow([
+            ",".join(task[field]) if field == "tags" else task[field]
+            for field in TASK_FIELDS
+        ])
+        yield buffer.getvalue()
+
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Header only, when there are no tasks
+    yield buffer.getvalue()
+
+
+@todo_bp.route('/todos/export', methods=['GET'])
+@limit_requests("10 per hour")
+@login_required
+def export_tasks(user_id: int) -> tuple[Response, int]:
+    """
+    Export every todo, with its tags, as NDJSON or CSV
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+      - name: format
+        in: query
+        description: Format of the export
+        required: false
+        schema:
+          type: string
+          enum: ["ndjson", "csv"]
+          example: "ndjson"
+
+    responses:
+      200:
+        description: >
+          Streamed file with one todo per line. CSV tags are comma
+          separated in a single column
+      400:
+        description: Bad request due to invalid query parameters
+    """
+    task_service = current_app.task_service
+
+    export_format = request.args.get("format", "ndjson")
+    extra_params = set(request.args.keys()) - {"format"}
+    errors = []
+
+    if export_format not in EXPORT_FORMATS:
+        errors.append(
+            f"Invalid value for format '{export_format}' "
+            f"(should be one of {', '.join(EXPORT_FORMATS)})"
+        )
+
+    if extra_params:
+        errors.append(f"Unexpected parameters: {', '.join(extra_params)}")
+
+    if errors:
+        return jsonify({
+            "message": "Invalid request",
+            "errors": errors
+        }), 400
+
+    tasks = task_service.iter_tasks_by_user_id(user_id)
+    lines = _ndjson_lines(tasks) if export_format == "ndjson" else _csv_lines(tasks)
+
+    return Response(
+        stream_with_context(lines),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={
+            "Content-Disposition": f"attachment; filename=todos.{export_format}"
+        }
+    ), 200
+
+
+@todo_bp.route('/todos/import', methods=['POST'])
+@limit_requests("10 per hour")
+@login_required
+def import_tasks(user_id: int) -> tuple[Response, int]:
+    """
+    Import todos in bulk
+    ---
+    tags:
+      - Tasks
+    consumes:
+      - application/x-ndjson
+      - application/json
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+      - name: tasks
+        in: body
+        description: >
+          One todo per line (application/x-ndjson) or a JSON array of todos
+          (application/json). Each todo needs a title and may have a
+          description, status and tags
+        required: true
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              title:
+                type: string
+                example: "Buy groceries"
+              description:
+                type: string
+                example: "Buy milk, eggs, and bread"
+              status:
+                type: string
+                example: "todo"
+              tags:
+                type: array
+                items:
+                  type: string
+                example: ["home"]
+
+    responses:
+      200:
+        description: >
+          Import report. Invalid todos are listed in errors with their
+          position (line for NDJSON, element for arrays) and do not stop
+          the import
+        schema:
+          type: object
+          properties:
+            imported:
+              type: integer
+              example: 2
+            failed:
+              type: integer
+              example: 1
+            errors:
+              type: array
+              items:
+                type: object
+                properties:
+                  item:
+                    type: integer
+                    example: 3
+                  message:
+                    type: string
+                    example: "Title cannot be empty"
+      415:
+        description: Body is neither NDJSON nor JSON
+    """
+    task_service = current_app.task_service
+
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        items = iter_ndjson(request.stream)
+    elif request.mimetype == "application/json":
+        items = iter_json_array(request.stream)
+    else:
+        return jsonify({
+            "message": "Body must be application/x-ndjson or application/json"
+        }), 415
+
+    report = task_service.import_tasks(user_id, items)
+
+    return jsonify(report), 200
+
+
+@todo_bp.route('/todos/batch', methods=['POST'])
+@limit_requests("100 per hour")
+@require_json_fields(required={"operations"})
+@login_required
+def batch_tasks(user_id: int) -> tuple[Response, int]:
+    """
+    Create, update and delete several todos in one transaction
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+      - name: operations
+        in: body
+        description: >
+          Operations applied in order. Either all of them succeed or none
+          is applied. Each todo can only be targeted by one operation
+        required: true
+        schema:
+          type: object
+          properties:
+            operations:
+              type: array
+              items:
+                type: object
+                properties:
+                  op:
+                    type: string
+                    enum: ["create", "update", "delete"]
+                  id:
+                    type: integer
+                    description: Target todo, for update and delete
+                  data:
+                    type: object
+                    description: Todo fields, for create and update
+              example:
+                - op: "create"
+                  data: {"title": "Buy groceries", "tags": ["home"]}
+                - op: "update"
+                  id: 1
+                  data: {"status": "done"}
+                - op: "delete"
+                  id: 2
+
+    responses:
+      200:
+        description: >
+          One result per operation, holding the created or updated todo
+          or the id of the deleted one
+      400:
+        description: Bad request due to invalid operations
+      403:
+        description: User has no permission to access one of the todos
+      404:
+        description: One of the todos was not found
+    """
+    task_service = current_app.task_service
+    operations = request.get_json()["operations"]
+    max_operations = current_app.config["BATCH_MAX_OPERATIONS"]
+
+    if isinstance(operations, list) and len(operations) > max_operations:
+        return jsonify({
+            "message": f"At most {max_operations} operations per batch"
+        }), 400
+
+    results = task_service.apply_batch(user_id, operations)
+
+    return jsonify({"results": results}), 200
+
+
+@todo_bp.route('/todos/changes', methods=['GET'])
+@limit_requests("500 per hour")
+@login_required
+def task_changes(user_id: int) -> tuple[Response, int]:
+    """
+    Get the changes to todos since a revision, for delta sync
+    ---
+    tags:
+      - Tasks
+    parameters:
+      - name: Authorization
+        in: header
+        description: Bearer access token
+        required: true
+        type: string
+        example: Bearer valid_access_token
+
+      - name: since
+        in: query
+        description: >
+          Revision returned by the previous sync, 0 to get every todo
+        required: true
+        schema:
+          type: integer
+          example: 42
+
+      - name: limit
+        in: query
+        description: Maximum number of changes returned
+        required: false
+        schema:
+          type: integer
+          example: 100
+
+    responses:
+      200:
+        description: >
+          Changes in revision order. "upsert" changes hold the current
+          todo, "delete" changes the id of a deleted todo. revision is the
+          value of since for the next sync, and has_more tells whether
+          there are more changes after it
+      400:
+        description: Bad request due to invalid query parameters
+    """
+    task_service = current_app.task_service
+
+    errors = []
+    extra_params = set(request.args.keys()) - {"since", "limit"}
+
+    try:
+        since = int(request.args.get("since", ""))
+        if since < 0:
+            raise ValueError()
+    except ValueError:
+        errors.append("Invalid value for since (should be a revision, 0 or higher)")
+
+    try:
+        limit = int(request.args.get("limit", 100))
+        if limit < 1:
+            raise ValueError()
+    except ValueError:
+        errors.append("Invalid value for limit (should be higher than 0)")
+
+    if extra_params:
+        errors.append(f"Unexpected parameters: {', '.join(extra_params)}")
+
+    if errors:
+        return jsonify({
+            "message": "Invalid request",
+            "errors": errors
+        }), 400
+
+    changes, has_more = task_service.changes_since(user_id, since, limit)
+
+    return jsonify({
+        "changes": changes,
+        "revision": changes[-1]["revision"] if changes else since,
+        "has_more": has_more
     }), 200
\ No newline at end of file
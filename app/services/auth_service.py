@@ -1,17 +1,20 @@
 #app/services/auth_service.py
 from app.errors import EmailAlreadyInUse, InvalidCredentials
-from app.models import User
+from app.models import User, TaskTombstone
+from app.services.password_hasher import PasswordHasher
+from sqlalchemy import delete
 from sqlalchemy.exc import IntegrityError
 import re
 
 class AccountService():
-    def __init__(self, db_session):
+    def __init__(self, db_session, password_hasher: PasswordHasher = None):
         self.db_session = db_session
+        self.password_hasher = password_hasher or PasswordHasher()
 
     def _validate_user_credentials(self, user, password) -> None:
         if (
             user is None
-            or not user.check_password(password)
+            or not self.password_hasher.verify(user.password, password)
         ):
             raise InvalidCredentials()
 
@@ -36,7 +39,11 @@ class AccountService():
         
         self.validate_email(email)
 
-        new_user = User(name, email, password)
+        new_user = User(
+            name,
+            email,
+            password_hash=self.password_hasher.hash(password)
+        )
         
         try:
             self.db_session.add(new_user)
@@ -56,6 +63,13 @@ class AccountService():
         )
 
         self._validate_user_credentials(user, password)
+
+        # The password is only known here, so hashes made with an older
+        # method or cost are upgraded on login
+        if self.password_hasher.needs_rehash(user.password):
+            user.password = self.password_hasher.hash(password)
+            self.db_session.commit()
+
         return user.id
 
 
@@ -67,6 +81,9 @@ class AccountService():
         user = self._get_user(user_id)
         self._validate_user_credentials(user, password)
 
+        self.db_session.execute(
+            delete(TaskTombstone).where(TaskTombstone.user_id == user_id)
+        )
         self.db_session.delete(user)
         self.db_session.commit()
 
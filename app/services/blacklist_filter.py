@@ -0,0 +1,97 @@
+# app/services/blacklist_filter.py
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app.models import BlacklistedToken
+import threading
+import time
+
+
+class BlacklistFilter():
+    """
+    In-process set of fingerprints (first 64 bits) of the hashes of
+    blacklisted tokens that have not expired yet. A token whose fingerprint
+    is not in the set is certainly not blacklisted, so the database only
+    needs to be consulted on a hit, which may be a false positive.
+
+    The set is loaded on first use and kept current by reading the rows
+    blacklisted since the last refresh (with some overlap for clock skew
+    and slow commits), at most every refresh_interval seconds. Every
+    full_reload_interval seconds it is rebuilt from scratch, which drops
+    expired tokens.
+
+    Args:
+        - refresh_interval (float): seconds between incremental refreshes
+        - full_reload_interval (float): seconds between full reloads
+        - overlap (float): seconds before the last refresh also read again
+    """
+    def __init__(self, refresh_interval: float = 5,
+                 full_reload_interval: float = 300, overlap: float = 60):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.overlap = timedelta(seconds=overlap)
+
+        self._fingerprints = set()
+        self._changed_since = None
+        self._refreshed_at = None
+        self._reloaded_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(token_hash: str) -> int:
+        return int(token_hash[:16], 16)
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def _load(self, session, full: bool) -> None:
+        started_at = datetime.now(tz=timezone.utc)
+        statement = select(BlacklistedToken.token_hash)\
+            .where(BlacklistedToken.expires_at > started_at)
+
+        if not full:
+            # By time rather than id, as ids may be committed out of order
+            statement = statement.where(
+                BlacklistedToken.blacklisted_at >= self._changed_since - self.overlap
+            )
+
+        fingerprints = set() if full else self._fingerprints
+
+        for token_hash in session.execute(statement).scalars():
+            fingerprints.add(self.fingerprint(token_hash))
+
+        self._fingerprints = fingerprints
+        self._changed_since = started_at
+
+    def refresh(self, session) -> None:
+        """
+        Loads the set if it never was, and otherwise reads the blacklisted
+        tokens added since the last refresh if refresh_interval has passed
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            full = self._reloaded_at is None or (
+                now - self._reloaded_at >= self.full_reload_interval
+            )
+
+            if not full and now - self._refreshed_at < self.refresh_interval:
+                return
+
+            self._load(session, full)
+            self._refreshed_at = now
+
+            if full:
+                self._reloaded_at = now
+
+    def add(self, token_hash: str) -> None:
+        """Adds a token blacklisted by this process, visible at once"""
+        with self._lock:
+            self._fingerprints.add(self.fingerprint(token_hash))
+
+    def might_contain(self, session, token_hash: str) -> bool:
+        """
+        Returns False if the token with token_hash is certainly not
+        blacklisted, and True if it may be
+        """
+        self.refresh(session)
+        return self.fingerprint(token_hash) in self._fingerprints
@@ -0,0 +1,98 @@
+# app/services/key_ring.py
+from jwt.algorithms import get_default_algorithms
+from app.errors import InvalidToken
+import os
+
+ASYMMETRIC_ALGORITHMS = ("EdDSA", "ES256")
+
+
+class KeyRing():
+    """
+    Keys used to sign and verify access tokens with an asymmetric
+    algorithm, indexed by key id (the "kid" header of each token). Keys are
+    parsed once, when the ring is built.
+
+    Only the active key signs, every key verifies, so keys can be rotated
+    without invalidating tokens: add the new key and make it active, then
+    remove the old one once the tokens it signed have expired.
+
+    Args:
+        - algorithm (str): "EdDSA" or "ES256"
+        - pem_keys (dict): PEM encoded key by kid. Private keys can sign
+          and verify, public keys only verify
+        - active_kid (str): kid of the private key that signs new tokens
+
+    Raises:
+        - ValueError: if the algorithm is not supported, a key cannot be
+          parsed or the active key is missing or not private
+    """
+    def __init__(self, algorithm: str, pem_keys: dict, active_kid: str):
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ValueError(f"Unsupported token algorithm '{algorithm}'")
+
+        # Asymmetric algorithms are only registered when cryptography is
+        # installed
+        self._algorithm = get_default_algorithms().get(algorithm)
+        if self._algorithm is None:
+            raise ValueError(f"{algorithm} requires the cryptography package")
+
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        self._signing_keys = {}
+        self._public_keys = {}
+
+        for kid, pem in pem_keys.items():
+            key = self._algorithm.prepare_key(pem)
+
+            if hasattr(key, "public_key"):
+                self._signing_keys[kid] = key
+                key = key.public_key()
+
+            self._public_keys[kid] = key
+
+        if active_kid not in self._signing_keys:
+            raise ValueError(f"No private key with kid '{active_kid}'")
+
+        self._jwks = {"keys": [
+            {
+                **self._algorithm.to_jwk(key, as_dict=True),
+                "kid": kid,
+                "alg": algorithm,
+                "use": "sig"
+            }
+            for kid, key in self._public_keys.items()
+        ]}
+
+    @classmethod
+    def from_directory(cls, path: str, algorithm: str, active_kid: str):
+        """
+        Builds a key ring from the <kid>.pem files in path
+        """
+        pem_keys = {}
+
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith(".pem"):
+                with open(os.path.join(path, filename), "rb") as file:
+                    pem_keys[filename[:-len(".pem")]] = file.read()
+
+        return cls(algorithm, pem_keys, active_kid)
+
+    @property
+    def signing_key(self):
+        return self._signing_keys[self.active_kid]
+
+    def verification_key(self, kid: str):
+        """
+        Returns the public key with kid
+
+        Raises:
+            - InvalidToken: if there is no key with kid
+        """
+        try:
+            return self._public_keys[kid]
+        except (KeyError, TypeError):
+            raise InvalidToken("Invalid token")
+
+    def jwks(self) -> dict:
+        """Returns the public keys as a JSON Web Key Set"""
+        return self._jwks
@@ -0,0 +1,95 @@
+# app/services/password_hasher.py
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+import multiprocessing
+import threading
+
+
+class PasswordHasher():
+    """
+    Hashes and verifies passwords with a key derivation function, on a
+    pool of worker processes so the CPU-bound work neither holds the GIL
+    nor blocks other request threads of the same process.
+
+    The pool is started on first use (so after a preforking server has
+    forked) with the spawn method, which does not copy the threads and
+    connections of the parent.
+
+    Args:
+        - method (str): werkzeug hashing method and cost, e.g. "scrypt"
+          or "pbkdf2:sha256:600000"
+        - workers (int): number of worker processes, 0 to hash on the
+          calling thread
+
+    Raises:
+        - ValueError: if method is not a werkzeug hashing method
+    """
+    def __init__(self, method: str = "scrypt", workers: int = 0):
+        self.method = method
+        self.workers = workers
+
+        self._pool = None
+        self._prefix = self._method_prefix(method)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _method_prefix(method: str) -> str:
+        """
+        Returns the parameters werkzeug writes before the salt of hashes
+        made with method, e.g. "scrypt:32768:8:1" for "scrypt", filling in
+        its defaults without running the key derivation function
+
+        Raises:
+            - ValueError: if method is not a werkzeug hashing method
+        """
+        name, *args = method.split(":")
+
+        if name == "scrypt":
+            if args and len(args) != 3:
+                raise ValueError("'scrypt' takes 3 arguments.")
+
+            n, r, p = map(int, args) if args else (2**15, 8, 1)
+            return f"scrypt:{n}:{r}:{p}"
+
+        if name == "pbkdf2":
+            if len(args) > 2:
+                raise ValueError("'pbkdf2' takes 2 arguments.")
+
+            hash_name = args[0] if args else "sha256"
+            iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+            return f"pbkdf2:{hash_name}:{iterations}"
+
+        raise ValueError(f"Invalid hash method '{method}'.")
+
+    def _run(self, function, *args):
+        if self.workers < 1:
+            return function(*args)
+
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+
+        return self._pool.submit(function, *args).result()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """
+        Returns True if password_hash was made with another method or cost
+        than the configured ones
+        """
+        return password_hash.split("$")[0] != self._prefix
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
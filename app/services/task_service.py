@@ -1,14 +1,132 @@
 # app/services/task_service.py 
 from sqlalchemy.exc import IntegrityError
-from app.models.task import Task, TaskStatus
+from app.models.task import Task, TaskStatus, TaskTombstone, TASK_FIELDS, task_tags
 from app.models.tag import Tag
+from app.models.user import User
 from app import db
 from app.errors import *
-from sqlalchemy import text
+from app.cache import LRUCache
+from functools import wraps
+from datetime import datetime, timezone
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy import text, func, select, insert, update, delete, tuple_, literal, Float, event
+from sqlalchemy.orm import Session
+import re
+import sys
+
+_MISSING = object()
+
+# Tag ids created inside a transaction are only cached once it commits,
+# so a rollback never leaves ids of tags that do not exist in a cache
+_PENDING_TAG_IDS = "pending_tag_ids"
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_pending_tag_ids(session):
+    for tag_cache, key, tag_id, user_id in session.info.pop(_PENDING_TAG_IDS, ()):
+        tag_cache.set(key, tag_id, group=user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_tag_ids(session):
+    session.info.pop(_PENDING_TAG_IDS, None)
+
+
+def cached_listing(method):
+    """
+    Serves a TaskService listing method through its listing cache. The key
+    holds the method, its arguments and the task_version of the user (read
+    unless passed as version), so entries are never served after a write,
+    even one made by another process
+    """
+    @wraps(method)
+    def wrapper(self, user_id, *args, version=None, **kwargs):
+        if self.listing_cache is None:
+            return method(self, user_id, *args, **kwargs)
+
+        if version is None:
+            version = self.task_version(user_id)
+
+        key = (
+            method.__name__, user_id, version,
+            args, tuple(sorted(kwargs.items()))
+        )
+        listing = self.listing_cache.get(key, _MISSING)
+
+        if listing is _MISSING:
+            listing = method(self, user_id, *args, **kwargs)
+            self.listing_cache.set(key, listing, group=user_id)
+
+        return _copy_listing(listing)
+
+    return wrapper
+
+
+def _copy_listing(listing):
+    """Copies the task dicts of a listing, so callers cannot alter the cache"""
+    if isinstance(listing, list):
+        return [dict(task) for task in listing]
+
+    if isinstance(listing, tuple):
+        tasks, total = listing
+        return [dict(task) for task in tasks], total
+
+    return listing
+
 
 class TaskService():
-    def __init__(self, session):
+    def __init__(self, session, listing_cache: LRUCache = None,
+                 tag_cache: LRUCache = None):
         self.session = session
+        self.listing_cache = listing_cache
+        self.tag_cache = tag_cache
+
+    def _invalidate_listings(self, user_id: int) -> None:
+        """Frees the cached listings of user, stale after a write"""
+        if self.listing_cache is not None:
+            self.listing_cache.invalidate_group(user_id)
+
+    def forget_user(self, user_id: int) -> None:
+        """Drops everything cached for a deleted user"""
+        self._invalidate_listings(user_id)
+
+        if self.tag_cache is not None:
+            self.tag_cache.invalidate_group(user_id)
+
+    def task_version(self, user_id: int) -> int:
+        """
+        Returns the version of the tasks of user, which changes whenever
+        any of them is created, updated or deleted
+        """
+        version = self.session.execute(
+            select(User.task_version).where(User.id == user_id)
+        ).scalar()
+
+        return version or 0
+
+    def _bump_task_version(self, user_id: int, changes: int = 1) -> int:
+        """
+        Increments the version of the tasks of user by the number of
+        changes inside the current transaction and returns the new version.
+        Each change gets its own revision, from version - changes + 1 up to
+        the returned version
+
+        Raises:
+            - UserNotFound: if user does not exist
+        """
+        users = User.__table__
+
+        version = self.session.execute(
+            update(users)
+            .where(users.c.id == user_id)
+            .values(task_version=users.c.task_version + changes)
+            .returning(users.c.task_version)
+        ).scalar()
+
+        if version is None:
+            raise UserNotFound()
+
+        return version
 
     def create_task(self, user_id: int, title: str, description: str = None):    
         if not title:
@@ -21,8 +139,11 @@ class TaskService():
                 description=description
             )
 
+            task.revision = self._bump_task_version(user_id)
+
             self.session.add(task)
             self.session.commit()
+            self._invalidate_listings(user_id)
 
             return task
 
@@ -56,63 +177,150 @@ class TaskService():
         Returns:
             - tag_id (int): id of tag
         """
+        return self._tag_ids(user_id, [name])[name]
+
+    @staticmethod
+    def _normalize_tag_names(tag_names: list[str]) -> list[str]:
+        """
+        Returns tag names stripped and lowercased, without empty names and
+        duplicates
+        """
+        names = (name.strip().lower() for name in tag_names)
+        return list(dict.fromkeys(name for name in names if name))
+
+    def _insert_missing_tags(self, user_id: int, names) -> None:
+        """
+        Creates the tags of user with the given names that do not exist yet
+        with a single multi-row INSERT. Tags created concurrently by another
+        transaction are skipped thanks to the (user_id, name) unique
+        constraint instead of being duplicated
+        """
+        rows = [{"user_id": user_id, "name": name} for name in names]
+        dialect = self.session.get_bind().dialect.name
+
+        if dialect == "postgresql":
+            statement = postgresql.insert(Tag.__table__)
+        elif dialect == "sqlite":
+            statement = sqlite.insert(Tag.__table__)
+        else:
+            self.session.execute(insert(Tag.__table__), rows)
+            return
+
+        self.session.execute(
+            statement.values(rows)
+            .on_conflict_do_nothing(index_elements=["user_id", "name"])
+        )
+
+    def _tag_ids(self, user_id: int, names) -> dict[str, int]:
+        """
+        Returns the id of each tag name of user, creating the missing tags.
+        Names found in the tag cache take no query; the rest take one query
+        when all tags exist and three when some do not. Names must already
+        be normalized
+        """
+        names = set(names)
+        tag_ids = {}
 
-        tag_id = self.session.execute(text("""
-            SELECT id from tags 
-            WHERE (name, user_id) = (:name, :user_id)
-        """), {"name":name, "user_id":user_id}).scalar()
+        if self.tag_cache is not None:
+            pending = {
+                key: tag_id for tag_cache, key, tag_id, _ in
+                self.session.info.get(_PENDING_TAG_IDS, ())
+                if tag_cache is self.tag_cache
+            }
+            for name in names:
+                key = (user_id, name)
+                tag_id = pending.get(key) or self.tag_cache.get(key)
+                if tag_id is not None:
+                    tag_ids[name] = tag_id
 
-        if tag_id is None:
-            tag_id = self.session.execute(text(
-                """
-                INSERT INTO tags (name, user_id)
-                VALUES (:name, :user_id)
-                RETURNING id
-                """
-            ), {"name":name, "user_id":user_id}).scalar()
+        def select_ids(names):
+            return dict(self.session.execute(
+                select(Tag.name, Tag.id)
+                .where(Tag.user_id == user_id, Tag.name.in_(names))
+            ).all())
 
-        return tag_id
+        missing = names - tag_ids.keys()
+        if not missing:
+            return tag_ids
 
-    def _update_task_tags(self, task: Task, tag_names: list[str]):
+        # Not pending, so these tags were committed before this transaction
+        found = select_ids(missing)
+        if self.tag_cache is not None:
+            for name, tag_id in found.items():
+                self.tag_cache.set((user_id, name), tag_id, group=user_id)
+
+        tag_ids.update(found)
+        missing -= found.keys()
+
+        if missing:
+            self._insert_missing_tags(user_id, missing)
+            created = select_ids(missing)
+            tag_ids.update(created)
+
+            if self.tag_cache is not None:
+                self.session.info.setdefault(_PENDING_TAG_IDS, []).extend(
+                    (self.tag_cache, (user_id, name), tag_id, user_id)
+                    for name, tag_id in created.items()
+                )
+
+        return tag_ids
+
+    def _update_task_tags(self, user_id: int, task_id: int,
+                          tag_names: list[str]) -> bool:
+        """
+        Makes the tags of task exactly tag_names. Only the links that
+        changed are deleted or inserted, each kind with one statement.
+        Returns whether any link changed
+        """
         if not isinstance(tag_names, list):
             raise ServiceError("Tags must be a list", 400)
 
-        self.session.execute(text(
-            """
-            DELETE FROM task_tags 
-            WHERE task_tags.task_id = :task_id
-            """
-        ), {"task_id": task.id})
+        if not all(isinstance(name, str) for name in tag_names):
+            raise ServiceError("Tags must be strings", 400)
 
-        user_id = task.user_id
+        names = self._normalize_tag_names(tag_names)
 
-        for name in set(tag_names):
-            name = name.strip().lower()
-            if not name:
-                continue
+        current = dict(self.session.execute(
+            select(Tag.name, Tag.id)
+            .join(task_tags, task_tags.c.tag_id == Tag.id)
+            .where(task_tags.c.task_id == task_id)
+        ).all())
+
+        removed = [tag_id for name, tag_id in current.items() if name not in names]
+        added = [name for name in names if name not in current]
 
-            tag_id = self.get_or_create_tag(user_id, name)
-            
-            # task.tags.append(tag)
-            self.session.execute(text(
-                """
-                INSERT INTO task_tags (task_id, tag_id)
-                VALUES (:task_id, :tag_id)
-                """
-            ), {"task_id": task.id, "tag_id": tag_id})
+        if removed:
+            self.session.execute(
+                task_tags.delete().where(
+                    task_tags.c.task_id == task_id,
+                    task_tags.c.tag_id.in_(removed)
+                )
+            )
 
-    def update_task(self, user_id: int, task_id: int, data: dict) -> dict:
-        task = self.get_task(task_id)
+        if added:
+            tag_ids = self._tag_ids(user_id, added)
+            self.session.execute(task_tags.insert(), [
+                {"task_id": task_id, "tag_id": tag_ids[name]} for name in added
+            ])
 
-        if task.user_id != user_id:
-            raise Forbidden()
+        return bool(removed or added)
+
+    @staticmethod
+    def _update_values(data: dict) -> tuple[dict, list[str]]:
+        """
+        Validates update data and returns the column values to set and the
+        new tag names (None if tags are not changed)
+        """
+        if not isinstance(data, dict):
+            raise ServiceError("Update data must be a JSON object", 400)
 
         allowed_fields = {
             "title": str,
             "description": str,
             "status": str,
-            "tags": list[str]
+            "tags": list
         }
+        values, tag_names = {}, None
 
         for field, value in data.items():
             if field not in allowed_fields:
@@ -124,36 +332,966 @@ class TaskService():
 
             if field == "status":
                 try:
-                    task.status = TaskStatus(value)
+                    values["status"] = TaskStatus(value)
                 except ValueError:
                     raise ServiceError(f"Status '{value}' not allowed", 400)
 
             elif field == "tags":
-                self._update_task_tags(task, value)
+                tag_names = value
 
             else:
-                setattr(task, field, value)
+                values[field] = value
+
+        return values, tag_names
+
+    def _apply_update(self, task: Task, data: dict) -> None:
+        """
+        Validates data and applies it to task, without committing
+        """
+        values, tag_names = self._update_values(data)
+
+        for field, value in values.items():
+            setattr(task, field, value)
+
+        if tag_names is not None:
+            # Links are changed with core statements, so a loaded
+            # collection would be stale
+            if self._update_task_tags(task.user_id, task.id, tag_names):
+                self.session.expire(task, ["tags"])
+
+    @staticmethod
+    def _mark_updated(task: Task, revision: int) -> None:
+        task.revision = revision
+        task.updated_at = datetime.now(tz=timezone.utc)
+
+    def _add_tombstones(self, user_id: int, task_ids: list[int],
+                        revisions) -> None:
+        """Records the deletion of tasks of user for delta sync"""
+        deleted_at = datetime.now(tz=timezone.utc)
+
+        self.session.execute(insert(TaskTombstone), [
+            {
+                "task_id": task_id,
+                "user_id": user_id,
+                "revision": revision,
+                "deleted_at": deleted_at
+            }
+            for task_id, revision in zip(task_ids, revisions)
+        ])
+
+    def _missing_task_error(self, user_id: int, task_id: int) -> ServiceError:
+        """
+        Returns the error for a task that an owner-scoped statement did not
+        affect: TaskNotFound if it does not exist, Forbidden if it belongs
+        to another user and PreconditionFailed if it is owned by user but
+        is not at the expected revision
+        """
+        owner_id = self.session.execute(
+            select(Task.user_id).where(Task.id == task_id)
+        ).scalar()
+
+        if owner_id is None:
+            return TaskNotFound()
+
+        if owner_id != user_id:
+            return Forbidden()
+
+        return PreconditionFailed()
+
+    def get_user_task(self, user_id: int, task_id: int) -> dict:
+        """
+        Returns a task of user as returned by the API, with its revision
+        under "revision"
+
+        Raises:
+            - TaskNotFound: if task does not exist
+            - Forbidden: if task belongs to another user
+        """
+        row = self.session.execute(
+            self._select_task_fields(TASK_FIELDS, Task.revision)
+            .where(Task.id == task_id, Task.user_id == user_id)
+        ).first()
+
+        if row is None:
+            raise self._missing_task_error(user_id, task_id)
+
+        return self._attach_tags([self._row_to_dict(row)])[0]
+
+    def update_task(self, user_id: int, task_id: int, data: dict,
+                    if_revisions: list[int] = None) -> dict:
+        """
+        Updates a task of user with a single UPDATE scoped to its owner,
+        returning the updated task with its new revision under "revision".
+
+        When if_revisions is given, the task is only updated if its current
+        revision is one of them, so concurrent clients never overwrite each
+        other's changes without locking the row
+
+        Raises:
+            - ServiceError: if data is invalid
+            - TaskNotFound: if task does not exist
+            - Forbidden: if task belongs to another user
+            - PreconditionFailed: if task is not at one of if_revisions
+        """
+        values, tag_names = self._update_values(data)
+        conditions = [Task.id == task_id, Task.user_id == user_id]
+
+        if if_revisions is not None:
+            conditions.append(Task.revision.in_(if_revisions))
+
+        try:
+            try:
+                revision = self._bump_task_version(user_id)
+            except UserNotFound:
+                # A user that does not exist owns no task
+                raise self._missing_task_error(user_id, task_id)
+
+            values.update(
+                revision=revision,
+                updated_at=datetime.now(tz=timezone.utc)
+            )
+
+            row = self.session.execute(
+                update(Task)
+                .where(*conditions)
+                .values(**values)
+                .returning(Task.id, Task.title, Task.description, Task.status,
+                           Task.revision)
+            ).first()
+
+            if row is None:
+                raise self._missing_task_error(user_id, task_id)
+
+            task = self._row_to_dict(row)
+
+            if tag_names is None:
+                task["tags"] = self._tags_by_task_id([task_id])[task_id]
+            else:
+                self._update_task_tags(user_id, task_id, tag_names)
+                task["tags"] = sorted(self._normalize_tag_names(tag_names))
+
+            self.session.commit()
+
+        except Exception:
+            self.session.rollback()
+            raise
+
+        self._invalidate_listings(user_id)
+        return task
+
+    def _owned_tasks(self, user_id: int, task_ids) -> dict[int, Task]:
+        """
+        Returns the tasks with the given ids, loaded with a single IN query
+
+        Raises:
+            - TaskNotFound: if any of the tasks does not exist
+            - Forbidden: if any of the tasks is not owned by user
+        """
+        tasks = {
+            task.id: task for task in
+            self.session.scalars(select(Task).where(Task.id.in_(task_ids)))
+        }
+
+        for task_id in task_ids:
+            if task_id not in tasks:
+                raise TaskNotFound(f"Task {task_id} not found")
+
+            if tasks[task_id].user_id != user_id:
+                raise Forbidden(f"Task {task_id} is not owned by user")
+
+        return tasks
+
+    def _validate_operations(self, operations) -> list[int]:
+        """
+        Validates the shape of batch operations and returns the ids of the
+        tasks they target, each of which may only be targeted once
+        """
+        if not isinstance(operations, list):
+            raise ServiceError("Operations must be a list", 400)
+
+        task_ids = []
+
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                raise ServiceError(f"Operation {index} must be a JSON object", 400)
+
+            op = operation.get("op")
+
+            if op not in ("create", "update", "delete"):
+                raise ServiceError(
+                    f"Operation {index}: 'op' must be create, update or delete", 400
+                )
+
+            if op == "create":
+                continue
+
+            task_id = operation.get("id")
+
+            if not isinstance(task_id, int) or isinstance(task_id, bool):
+                raise ServiceError(f"Operation {index}: 'id' must be an integer", 400)
+
+            if task_id in task_ids:
+                raise ServiceError(
+                    f"Operation {index}: task {task_id} is already targeted "
+                    "by another operation", 400
+                )
+
+            task_ids.append(task_id)
+
+        return task_ids
+
+    def apply_batch(self, user_id: int, operations: list[dict]) -> list[dict]:
+        """
+        Applies a list of create, update and delete operations to tasks of
+        user in a single transaction: either all of them succeed or none
+        does. Ownership of every targeted task is checked with one query.
+
+        Operations:
+            - {"op": "create", "data": {"title": ..., ...}}
+            - {"op": "update", "id": 1, "data": {"status": "done", ...}}
+            - {"op": "delete", "id": 1}
+
+        Returns:
+            - results (list[dict]): one per operation, in the same order,
+              with the created or updated task or the deleted id
+        """
+        task_ids = self._validate_operations(operations)
+        results = []
+        deleted_ids, deleted_revisions = [], []
+
+        if not operations:
+            return results
+
+        try:
+            # The user row is locked before the targets are read, so no
+            # concurrent write of the same user can delete them meanwhile
+            try:
+                version = self._bump_task_version(user_id, len(operations))
+            except UserNotFound:
+                # A user that does not exist owns no task
+                if task_ids:
+                    self._owned_tasks(user_id, task_ids)
+                raise
+
+            first_revision = version - len(operations) + 1
+
+            tasks = self._owned_tasks(user_id, task_ids) if task_ids else {}
+
+            for index, operation in enumerate(operations):
+                op = operation["op"]
+                revision = first_revision + index
+
+                try:
+                    if op == "create":
+                        values, tag_names = self._import_values(operation.get("data"))
+                        task = Task(user_id, values["title"], values["description"])
+                        task.status = values["status"]
+                        task.revision = revision
+
+                        self.session.add(task)
+                        self.session.flush()
+
+                        if tag_names:
+                            self._update_task_tags(user_id, task.id, tag_names)
+
+                        results.append({"op": op, "task": task})
+
+                    elif op == "update":
+                        task = tasks[operation["id"]]
+                        self._apply_update(task, operation.get("data"))
+                        self._mark_updated(task, revision)
+                        results.append({"op": op, "task": task})
+
+                    else:
+                        deleted_ids.append(operation["id"])
+                        deleted_revisions.append(revision)
+                        results.append({"op": op, "id": operation["id"]})
+
+                except ServiceError as e:
+                    raise ServiceError(f"Operation {index}: {e.message}", e.status_code)
+
+            if deleted_ids:
+                for task_id in deleted_ids:
+                    self.session.expunge(tasks[task_id])
+
+                self.session.execute(
+                    task_tags.delete().where(task_tags.c.task_id.in_(deleted_ids))
+                )
+                self.session.execute(
+                    delete(Task)
+                    .where(Task.id.in_(deleted_ids))
+                    .execution_options(synchronize_session=False)
+                )
+                self._add_tombstones(user_id, deleted_ids, deleted_revisions)
+
+            self.session.flush()
+
+            # Serialized before commit, which would expire every task, with
+            # the tags of all of them loaded at once
+            tags = self._tags_by_task_id(
+                [result["task"].id for result in results if "task" in result]
+            )
+            for result in results:
+                if "task" in result:
+                    task = result["task"]
+                    result["task"] = task.to_dict(tags=tags[task.id])
+
+            self.session.commit()
+
+        except Exception:
+            self.session.rollback()
+            raise
+
+        self._invalidate_listings(user_id)
+        return results
+
+    def _import_values(self, data) -> tuple[dict, list[str]]:
+        """
+        Validates one imported task and returns its column values and
+        normalized tag names
+
+        Raises:
+            - ServiceError: describing the first problem found
+        """
+        if not isinstance(data, dict):
+            raise ServiceError("Task must be a JSON object", 400)
+
+        allowed_fields = {"title", "description", "status", "tags"}
+        for field in data:
+            if field not in allowed_fields:
+                raise ServiceError(f"Field '{field}' not allowed", 400)
+
+        title = data.get("title")
+        if not isinstance(title, str) or not title:
+            raise TitleEmpty()
+
+        description = data.get("description")
+        if description is not None and not isinstance(description, str):
+            raise ServiceError("Field 'description' must be a string", 400)
+
+        try:
+            status = TaskStatus(data.get("status", TaskStatus.TODO.value))
+        except ValueError:
+            raise ServiceError(f"Status '{data['status']}' not allowed", 400)
+
+        tag_names = data.get("tags", [])
+        if not isinstance(tag_names, list):
+            raise ServiceError("Tags must be a list", 400)
+
+        if not all(isinstance(name, str) for name in tag_names):
+            raise ServiceError("Tags must be strings", 400)
+
+        values = {"title": title, "description": description, "status": status}
+        return values, self._normalize_tag_names(tag_names)
+
+    def _insert_tasks(self, user_id: int, chunk: list[tuple[dict, list[str]]]) -> int:
+        """
+        Inserts a chunk of validated tasks and their tag links with
+        multi-row INSERTs and commits them in a single transaction
+        """
+        try:
+            version = self._bump_task_version(user_id, len(chunk))
+            first_revision = version - len(chunk) + 1
+            updated_at = datetime.now(tz=timezone.utc)
 
-        self.session.commit()
-        return task.to_dict()
+            task_ids = self.session.scalars(
+                insert(Task).returning(Task.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "user_id": user_id,
+                        "revision": first_revision + index,
+                        "updated_at": updated_at,
+                        **values
+                    }
+                    for index, (values, _) in enumerate(chunk)
+                ]
+            ).all()
+
+            names = {name for _, tag_names in chunk for name in tag_names}
+
+            if names:
+                tag_ids = self._tag_ids(user_id, names)
+                self.session.execute(task_tags.insert(), [
+                    {"task_id": task_id, "tag_id": tag_ids[name]}
+                    for task_id, (_, tag_names) in zip(task_ids, chunk)
+                    for name in tag_names
+                ])
+
+            self.session.commit()
+            self._invalidate_listings(user_id)
+            return len(task_ids)
+
+        except IntegrityError:
+            self.session.rollback()
+            raise UserNotFound()
+
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def import_tasks(self, user_id: int, items, chunk_size: int = 500) -> dict:
+        """
+        Creates tasks for user from an iterable of (position, data, error)
+        tuples, as yielded by iter_ndjson and iter_json_array. Valid tasks
+        are inserted chunk_size at a time, one transaction per chunk, and
+        invalid ones are reported without stopping the import
+
+        Returns:
+            - report (dict): number of imported and failed tasks, and the
+              errors with the position of the item they refer to
+        """
+        imported = 0
+        errors = []
+        chunk = []
+
+        for position, data, error in items:
+            if error is None:
+                try:
+                    chunk.append(self._import_values(data))
+                except ServiceError as e:
+                    error = e.message
+
+            if error is not None:
+                errors.append({"item": position, "message": error})
+                continue
+
+            if len(chunk) >= chunk_size:
+                imported += self._insert_tasks(user_id, chunk)
+                chunk = []
+
+        if chunk:
+            imported += self._insert_tasks(user_id, chunk)
+
+        return {
+            "imported": imported,
+            "failed": len(errors),
+            "errors": errors
+        }
 
     def delete_task(self, user_id: int, task_id: int):
-        task = self.get_task(task_id)
+        """
+        Deletes a task of user and its tag links with DELETEs scoped to its
+        owner
+
+        Raises:
+            - TaskNotFound: if task does not exist
+            - Forbidden: if task belongs to another user
+        """
+        owned = select(Task.id)\
+            .where(Task.id == task_id, Task.user_id == user_id)\
+            .scalar_subquery()
+
+        try:
+            # The user row is locked first, as on every other write, so a
+            # concurrent update of the same task cannot deadlock with this
+            try:
+                revision = self._bump_task_version(user_id)
+            except UserNotFound:
+                raise self._missing_task_error(user_id, task_id)
+
+            self.session.execute(
+                task_tags.delete().where(task_tags.c.task_id == owned)
+            )
+            deleted = self.session.execute(
+                delete(Task)
+                .where(Task.id == task_id, Task.user_id == user_id)
+                .returning(Task.id)
+            ).first()
+
+            if deleted is None:
+                raise self._missing_task_error(user_id, task_id)
+
+            self._add_tombstones(user_id, [task_id], [revision])
+            self.session.commit()
+
+        except Exception:
+            self.session.rollback()
+            raise
+
+        self._invalidate_listings(user_id)
+
+
+    def _task_conditions(self, user_id: int, status: str = None,
+                         tag: str = None) -> list:
+        """
+        Returns the WHERE conditions selecting the tasks of user, optionally
+        only the ones with the given status and/or tag
+        """
+        conditions = [Task.user_id == user_id]
+
+        if status is not None:
+            conditions.append(Task.status == TaskStatus(status))
+
+        if tag is not None:
+            conditions.append(Task.id.in_(
+                select(task_tags.c.task_id)
+                .join(Tag, Tag.id == task_tags.c.tag_id)
+                .where(Tag.user_id == user_id, Tag.name == tag.strip().lower())
+            ))
+
+        return conditions
+
+
+    @staticmethod
+    def _task_ordering(sort: str) -> list:
+        """
+        Returns the ORDER BY clauses for one of TASK_SORTS. Ties are broken
+        by id, so the ordering is total and usable for keyset pagination
+        """
+        column = getattr(Task, sort.lstrip("-"))
+        columns = [column] if column is Task.id else [column, Task.id]
+
+        if sort.startswith("-"):
+            return [column.desc() for column in columns]
+
+        return [column.asc() for column in columns]
+
+
+    @cached_listing
+    def count_tasks_by_user_id(self, user_id: int, cap: int = None,
+                               status: str = None, tag: str = None):
+        """
+        Returns the number of tasks owned by user. When cap is given,
+        counting stops after cap rows, so the result is min(total, cap)
+
+        Args:
+            - user_id (int): id of tasks owner
+            - cap (int): maximum number of rows counted
+            - status (str): only count tasks with this status
+            - tag (str): only count tasks with this tag
+        """
+        matching = select(Task.id)\
+            .where(*self._task_conditions(user_id, status, tag))\
+            .limit(cap)\
+            .subquery()
+
+        return self.session.execute(
+            select(func.count()).select_from(matching)
+        ).scalar()
+
+
+    def _select_task_fields(self, fields, *extra):
+        """
+        Returns a SELECT of only the given task columns (id is always
+        included), so rows can be read without building Task instances.
+        tags is not a column and is left for _attach_tags
+        """
+        columns = ("id", *(
+            field for field in fields if field not in ("id", "tags")
+        ))
+        return select(*(getattr(Task, field) for field in columns), *extra)
+
+
+    def _attach_tags(self, tasks: list[dict], fields=TASK_FIELDS) -> list[dict]:
+        """
+        Adds the tag names to task dicts when tags is one of fields, with
+        one query for all of them however many tasks there are
+        """
+        if "tags" in fields and tasks:
+            tags = self._tags_by_task_id([task["id"] for task in tasks])
+
+            for task in tasks:
+                task["tags"] = tags[task["id"]]
+
+        return tasks
+
+
+    @staticmethod
+    def _row_to_dict(row) -> dict:
+        data = row._asdict()
+
+        if "status" in data:
+            data["status"] = data["status"].value
+
+        return data
+
+
+    @cached_listing
+    def tasks_by_user_id(self, user_id: int, page: int, limit: int,
+                         lookahead: int = 0, fields=TASK_FIELDS,
+                         sort: str = "id", status: str = None,
+                         tag: str = None) -> list[dict]:
+        """
+        Returns the tasks of user in the given page as dicts holding only
+        the requested fields. When lookahead is given, that many rows after
+        the page are returned too, which tells whether there is a next page
+        without counting
+        """
+        rows = self.session.execute(
+            self._select_task_fields(fields)
+            .where(*self._task_conditions(user_id, status, tag))
+            .order_by(*self._task_ordering(sort))
+            .limit(limit + lookahead)
+            .offset((page - 1) * limit)
+        )
+
+        return self._attach_tags([self._row_to_dict(row) for row in rows], fields)
+
+
+    @cached_listing
+    def tasks_and_total_by_user_id(self, user_id: int, page: int, limit: int,
+                                   fields=TASK_FIELDS, sort: str = "id",
+                                   status: str = None, tag: str = None):
+        """
+        Returns the tasks of user in the given page and the total number
+        of matching tasks, computed by a window count in the same statement
+
+        Returns:
+            - (tasks, total) (tuple[list[dict], int])
+        """
+        rows = self.session.execute(
+            self._select_task_fields(fields, func.count().over().label("total"))
+            .where(*self._task_conditions(user_id, status, tag))
+            .order_by(*self._task_ordering(sort))
+            .limit(limit)
+            .offset((page - 1) * limit)
+        ).all()
+
+        if rows:
+            tasks = [self._row_to_dict(row) for row in rows]
+            total = rows[0].total
+
+            for task in tasks:
+                del task["total"]
+
+            return self._attach_tags(tasks, fields), total
+
+        # Past the last page the window has no rows to report the total on
+        if page > 1:
+            return [], self.count_tasks_by_user_id(user_id, status=status, tag=tag)
 
-        if task.user_id != user_id:
-            raise Forbidden()
+        return [], 0
 
-        self.session.delete(task)
-        self.session.commit()
 
+    @cached_listing
+    def tasks_after_id(self, user_id: int, after_id: int, limit: int,
+                       fields=TASK_FIELDS, sort: str = "id", after_key=None,
+                       status: str = None, tag: str = None) -> list[dict]:
+        """
+        Returns up to limit tasks of user that come after the task with
+        after_id in the given ordering. Seeks through the index instead of
+        skipping rows, so the cost does not grow with how deep into the
+        list the page is.
+
+        Args:
+            - user_id (int): id of tasks owner
+            - after_id (int): id of the last task of the previous page
+            - limit (int): maximum number of tasks returned
+            - fields (tuple[str]): task fields to be returned
+            - sort (str): one of TASK_SORTS
+            - after_key: value of the sort field of the last task of the
+              previous page (unused when sorting by id)
+            - status (str): only return tasks with this status
+            - tag (str): only return tasks with this tag
+        """
+        column = getattr(Task, sort.lstrip("-"))
+
+        if column is Task.id:
+            position, after = Task.id, after_id
+        else:
+            if column is Task.status:
+                after_key = TaskStatus(after_key)
+            position = tuple_(column, Task.id)
+            after = tuple_(literal(after_key, column.type), literal(after_id))
+
+        seek = position < after if sort.startswith("-") else position > after
+
+        rows = self.session.execute(
+            self._select_task_fields(fields)
+            .where(*self._task_conditions(user_id, status, tag), seek)
+            .order_by(*self._task_ordering(sort))
+            .limit(limit)
+        )
+
+        return self._attach_tags([self._row_to_dict(row) for row in rows], fields)
+
+
+    def _tags_by_task_id(self, task_ids: list[int]) -> dict[int, list[str]]:
+        """
+        Returns the tag names of each of the given tasks, loaded with a
+        single query and sorted by name
+        """
+        tags = {task_id: [] for task_id in task_ids}
+
+        if not tags:
+            return tags
+
+        rows = self.session.execute(
+            select(task_tags.c.task_id, Tag.name)
+            .join(Tag, Tag.id == task_tags.c.tag_id)
+            .where(task_tags.c.task_id.in_(task_ids))
+            .order_by(Tag.name)
+        )
+
+        for task_id, name in rows:
+            tags[task_id].append(name)
+
+        return tags
+
+
+    def _tag_usage(self, tags, limit: int = None) -> list[dict]:
+        """
+        Returns name and number of tasks of each tag in the tags subquery
+        (with id and name columns), most used first, up to limit tags
+        """
+        count = func.count(task_tags.c.task_id)
+
+        rows = self.session.execute(
+            select(tags.c.name, count)
+            .outerjoin(task_tags, task_tags.c.tag_id == tags.c.id)
+            .group_by(tags.c.id, tags.c.name)
+            .order_by(count.desc(), tags.c.name)
+            .limit(limit)
+        )
+
+        return [{"name": name, "count": count} for name, count in rows]
+
+    @cached_listing
+    def tags_by_user_id(self, user_id: int) -> list[dict]:
+        """
+        Returns every tag of user with the number of tasks using it, most
+        used first
+
+        Args:
+            - user_id (int): id of tags owner
+        """
+        tags = select(Tag.id, Tag.name)\
+            .where(Tag.user_id == user_id)\
+            .subquery()
+
+        return self._tag_usage(tags)
+
+    @cached_listing
+    def suggest_tags(self, user_id: int, prefix: str, limit: int,
+                     scan_limit: int = 200) -> list[dict]:
+        """
+        Returns up to limit tags of user whose name starts with prefix,
+        most used first.
+
+        Names are matched with a range over the (user_id, name) index,
+        prefix <= name < next prefix, instead of LIKE, which most databases
+        cannot serve from a regular index. The range is compared in code
+        point order ("C" collation on PostgreSQL), the only one where it
+        holds exactly the names starting with prefix. Only the first
+        scan_limit names of the range are ranked, so the cost is bounded
+        for short prefixes
+
+        Args:
+            - user_id (int): id of tags owner
+            - prefix (str): start of the tag name typed by the user
+            - limit (int): maximum number of tags returned
+            - scan_limit (int): maximum number of matching names ranked
+        """
+        prefix = prefix.strip().lower()
+        conditions = [Tag.user_id == user_id]
+        name = Tag.name
+
+        if self.session.get_bind().dialect.name == "postgresql":
+            name = Tag.name.collate("C")
+
+        if prefix:
+            next_prefix = self._next_prefix(prefix)
+            conditions.append(name >= prefix)
+
+            if next_prefix is not None:
+                conditions.append(name < next_prefix)
+            else:
+                conditions.append(Tag.name.startswith(prefix, autoescape=True))
+
+        tags = select(Tag.id, Tag.name)\
+            .where(*conditions)\
+            .order_by(name)\
+            .limit(scan_limit)\
+            .subquery()
+
+        return self._tag_usage(tags, limit)
+
+    @staticmethod
+    def _next_prefix(prefix: str) -> str:
+        """
+        Returns the first string after every string starting with prefix,
+        or None if there is none (the prefix ends with the last code point)
+        """
+        code_point = ord(prefix[-1]) + 1
+
+        if code_point > sys.maxunicode:
+            return None
+
+        # Surrogates cannot be encoded, and are never part of a name
+        if 0xD800 <= code_point <= 0xDFFF:
+            code_point = 0xE000
+
+        return prefix[:-1] + chr(code_point)
+
+    def iter_tasks_by_user_id(self, user_id: int, batch_size: int = 500):
+        """
+        Yields every task of user, with its tags, as a dict. Rows are
+        streamed from a server-side cursor batch_size at a time and the
+        tags of each batch are loaded with one query, so memory use does
+        not depend on how many tasks the user has
+        """
+        result = self.session.execute(
+            self._select_task_fields(TASK_FIELDS)
+            .where(Task.user_id == user_id)
+            .order_by(Task.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        for rows in result.partitions():
+            yield from self._attach_tags([self._row_to_dict(row) for row in rows])
+
+
+    @staticmethod
+    def _utc_isoformat(moment: datetime) -> str:
+        if moment is None:
+            return None
+
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+
+        return moment.isoformat()
+
+
+    def changes_since(self, user_id: int, since: int, limit: int):
+        """
+        Returns the changes to tasks of user with a revision higher than
+        since, in revision order: the current state of created or updated
+        tasks (once, at their latest revision) and the ids of deleted ones.
+        Both come from the (user_id, revision) indexes.
+
+        Returns:
+            - (changes, has_more) (tuple[list[dict], bool])
+        """
+        tasks = self.session.execute(
+            self._select_task_fields(TASK_FIELDS, Task.revision, Task.updated_at)
+            .where(Task.user_id == user_id, Task.revision > since)
+            .order_by(Task.revision)
+            .limit(limit + 1)
+        ).all()
+
+        tombstones = self.session.execute(
+            select(TaskTombstone.task_id, TaskTombstone.revision,
+                   TaskTombstone.deleted_at)
+            .where(TaskTombstone.user_id == user_id, TaskTombstone.revision > since)
+            .order_by(TaskTombstone.revision)
+            .limit(limit + 1)
+        ).all()
+
+        changes = []
+
+        for task in self._attach_tags([self._row_to_dict(row) for row in tasks]):
+            task["updated_at"] = self._utc_isoformat(task["updated_at"])
+
+            changes.append({
+                "type": "upsert",
+                "revision": task.pop("revision"),
+                "task": task
+            })
+
+        for row in tombstones:
+            changes.append({
+                "type": "delete",
+                "revision": row.revision,
+                "id": row.task_id,
+                "deleted_at": self._utc_isoformat(row.deleted_at)
+            })
+
+        changes.sort(key=lambda change: change["revision"])
+
+        return changes[:limit], len(changes) > limit
+
+
+    def _search_statement(self, dialect: str, user_id: int, terms: list[str]):
+        """
+        Returns the ranked full-text search statement for the dialect and
+        the value bound to :query. Lower scores rank first on both dialects
+        """
+        if dialect == "postgresql":
+            query = " & ".join(terms) + ":*"
+            sql = """
+                SELECT tasks.id, tasks.title, tasks.description, tasks.status,
+                       -ts_rank(tasks.search_vector, query) AS score
+                FROM tasks, to_tsquery('simple', :query) AS query
+                WHERE tasks.user_id = :user_id
+                AND tasks.search_vector @@ query
+            """
+
+        elif dialect == "sqlite":
+            # Every term is quoted, so user input cannot inject FTS5 syntax
+            phrases = " ".join(f'"{term}"' for term in terms)
+            query = f'user_id : "{user_id}" AND {{title description}} : ({phrases} *)'
+            sql = """
+                SELECT tasks.id, tasks.title, tasks.description, tasks.status,
+                       bm25(tasks_fts, 10.0, 1.0, 0.0) AS score
+                FROM tasks_fts
+                JOIN tasks ON tasks.id = tasks_fts.rowid
+                WHERE tasks_fts MATCH :query
+                AND tasks.user_id = :user_id
+            """
+
+        else:
+            raise ServiceError(f"Search is not supported on {dialect}", 501)
+
+        return sql, query
+
+
+    def search_tasks(self, user_id: int, query: str, limit: int,
+                     after_id: int = None, after_rank: float = None) -> list[dict]:
+        """
+        Returns up to limit tasks of user whose title or description match
+        all words of query (the last one as a prefix), best matches first.
+        Each task has a "rank" key, which together with its id is the
+        keyset position used to continue the search after it.
+
+        Ranks are not stable across writes: SQLite's bm25 weighs terms with
+        statistics of the whole index, so any user's changes between two
+        pages can move a task across the keyset position
+
+        Args:
+            - user_id (int): id of tasks owner
+            - query (str): text typed by the user
+            - limit (int): maximum number of tasks returned
+            - after_id (int): id of the last task of the previous page
+            - after_rank (float): rank of the last task of the previous page
+
+        Raises:
+            - ServiceError: if query has no words
+        """
+        terms = re.findall(r"\w+", query.lower())
+
+        if not terms:
+            raise ServiceError("Search query must contain at least one word", 400)
+
+        dialect = self.session.get_bind().dialect.name
+        sql, match = self._search_statement(dialect, user_id, terms)
+        params = {
+            "query": match,
+            "user_id": user_id,
+            "limit": limit
+        }
+
+        seek = ""
+        if after_id is not None:
+            seek = """
+                WHERE score > :after_rank
+                OR (score = :after_rank AND id > :after_id)
+            """
+            params.update({"after_id": after_id, "after_rank": after_rank})
 
-    def count_tasks_by_user_id(self, user_id: int):
-        return self.session.query(Task).filter(Task.user_id == user_id).count()    
+        statement = text(f"""
+            SELECT * FROM ({sql}) AS matches
+            {seek}
+            ORDER BY score, id
+            LIMIT :limit
+        """).columns(
+            Task.id, Task.title, Task.description, Task.status,
+            score=Float
+        )
 
+        tasks = []
+        for row in self.session.execute(statement, params):
+            task = self._row_to_dict(row)
+            task["rank"] = task.pop("score")
+            tasks.append(task)
 
-    def tasks_by_user_id(self, user_id: int, page: int, limit: int):
-        return self.session.query(Task)\
-            .filter(Task.user_id == user_id)\
-            .limit(limit)\
-            .offset((page - 1) * limit)\
-            .all()
+        return self._attach_tags(tasks)
@@ -0,0 +1,150 @@
+# app/services/token_epochs.py
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models import TokenEpoch
+import threading
+import time
+
+
+class TokenEpochs():
+    """
+    In-process map of user id -> token epoch, for the users whose tokens
+    were ever revoked all at once. A token is valid only if its "gen"
+    claim is not lower than the epoch of its user, which is checked
+    without touching the database.
+
+    The map is loaded on first use and kept current by reading the epochs
+    changed since the last refresh (with some overlap for clock skew and
+    slow commits), at most every refresh_interval seconds, and fully
+    reloaded every full_reload_interval seconds.
+
+    Args:
+        - refresh_interval (float): seconds between incremental refreshes
+        - full_reload_interval (float): seconds between full reloads
+        - overlap (float): seconds before the last refresh also read again
+    """
+    def __init__(self, refresh_interval: float = 5,
+                 full_reload_interval: float = 300, overlap: float = 60):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.overlap = timedelta(seconds=overlap)
+
+        self._epochs = {}
+        self._changed_since = None
+        self._refreshed_at = None
+        self._reloaded_at = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._epochs)
+
+    def _load(self, session, full: bool) -> None:
+        started_at = datetime.now(tz=timezone.utc)
+        statement = select(TokenEpoch.user_id, TokenEpoch.epoch)
+
+        if not full:
+            statement = statement.where(
+                TokenEpoch.changed_at >= self._changed_since - self.overlap
+            )
+
+        epochs = {} if full else self._epochs
+
+        for user_id, epoch in session.execute(statement):
+            epochs[user_id] = max(epoch, epochs.get(user_id, 0))
+
+        self._epochs = epochs
+        self._changed_since = started_at
+
+    def refresh(self, session) -> None:
+        """
+        Loads the map if it never was, and otherwise reads the epochs
+        changed since the last refresh if refresh_interval has passed
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            full = self._reloaded_at is None or (
+                now - self._reloaded_at >= self.full_reload_interval
+            )
+
+            if not full and now - self._refreshed_at < self.refresh_interval:
+                return
+
+            self._load(session, full)
+            self._refreshed_at = now
+
+            if full:
+                self._reloaded_at = now
+
+    def get(self, session, user_id: int) -> int:
+        """Returns the epoch of user as last refreshed"""
+        self.refresh(session)
+        return self._epochs.get(user_id, 0)
+
+    def current(self, session, user_id: int) -> int:
+        """Returns the epoch of user as stored, for issuing new tokens"""
+        epoch = session.execute(
+            select(TokenEpoch.epoch).where(TokenEpoch.user_id == user_id)
+        ).scalar()
+
+        return epoch or 0
+
+    def _select_and_bump(self, session, user_id: int, now: datetime) -> int:
+        """
+        Increments the epoch of user without an upsert, for dialects that
+        have none: the row is locked, then updated or inserted
+        """
+        epoch = session.execute(
+            select(TokenEpoch.epoch)
+            .where(TokenEpoch.user_id == user_id)
+            .with_for_update()
+        ).scalar()
+
+        if epoch is None:
+            epoch = 1
+            session.add(TokenEpoch(user_id=user_id, epoch=epoch, changed_at=now))
+        else:
+            epoch += 1
+            session.execute(
+                update(TokenEpoch)
+                .where(TokenEpoch.user_id == user_id)
+                .values(epoch=epoch, changed_at=now)
+            )
+
+        return epoch
+
+    def bump(self, session, user_id: int) -> int:
+        """
+        Increments the epoch of user, revoking every token issued to it so
+        far, commits and returns the new epoch
+        """
+        now = datetime.now(tz=timezone.utc)
+        dialect = session.get_bind().dialect.name
+
+        if dialect == "postgresql":
+            statement = postgresql.insert(TokenEpoch)
+        elif dialect == "sqlite":
+            statement = sqlite.insert(TokenEpoch)
+        else:
+            statement = None
+
+        if statement is not None:
+            epoch = session.execute(
+                statement
+                .values(user_id=user_id, epoch=1, changed_at=now)
+                .on_conflict_do_update(
+                    index_elements=["user_id"],
+                    set_={"epoch": TokenEpoch.epoch + 1, "changed_at": now}
+                )
+                .returning(TokenEpoch.epoch)
+            ).scalar()
+        else:
+            epoch = self._select_and_bump(session, user_id, now)
+
+        session.commit()
+
+        with self._lock:
+            self._epochs[user_id] = max(epoch, self._epochs.get(user_id, 0))
+
+        return epoch
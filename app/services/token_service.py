@@ -2,16 +2,41 @@
 import jwt
 import hashlib
 from datetime import datetime, timedelta, timezone
-from app.errors import InvalidToken, ExpiredToken, ServiceError
+from app.errors import InvalidToken, ExpiredToken, ServiceError, FeatureDisabled
 from app.models import BlacklistedToken
-from sqlalchemy import text
+from app.services.blacklist_filter import BlacklistFilter
+from app.services.token_epochs import TokenEpochs
+from app.services.key_ring import KeyRing
+from app.cache import LRUCache
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
+import time
 
 class TokenService():
-    def __init__(self, db, access_secret: str, refresh_secret: str):
+    def __init__(self, db, access_secret: str, refresh_secret: str,
+                 blacklist_filter: BlacklistFilter = None,
+                 claims_cache: LRUCache = None,
+                 token_epochs: TokenEpochs = None,
+                 access_keys: KeyRing = None):
         self.algorithm = "HS256"
         self.access_secret = access_secret
         self.refresh_secret = refresh_secret
         self.db = db
+        self.blacklist_filter = blacklist_filter
+        # Verified claims by (type, token digest), kept until exp
+        self.claims_cache = claims_cache
+        self.token_epochs = token_epochs
+        # Access tokens are signed with these keys instead of the access
+        # secret when given, so they can be verified without any secret
+        self.access_keys = access_keys
+
+    def _claims(self, sub, exp: datetime) -> dict:
+        claims = {"sub": str(sub), "exp": exp}
+
+        if self.token_epochs is not None:
+            claims["gen"] = self.token_epochs.current(self.db, int(sub))
+
+        return claims
 
     def new_access_token(self, sub: str) -> str:
         """
@@ -19,10 +44,18 @@ class TokenService():
         Expires in 15 minutes
         """
         exp = datetime.now(tz=timezone.utc) + timedelta(minutes=15)
-        return jwt.encode({
-            "sub": str(sub),
-            "exp": exp
-        }, self.access_secret, self.algorithm)
+
+        if self.access_keys is not None:
+            return jwt.encode(
+                self._claims(sub, exp),
+                self.access_keys.signing_key,
+                self.access_keys.algorithm,
+                headers={"kid": self.access_keys.active_kid}
+            )
+
+        return jwt.encode(
+            self._claims(sub, exp), self.access_secret, self.algorithm
+        )
 
     def new_refresh_token(self, sub: str):
         """
@@ -30,15 +63,19 @@ class TokenService():
         Expires in 30 days
         """
         exp = datetime.now(tz=timezone.utc) + timedelta(days=30)
-        return jwt.encode({
-            "sub": str(sub),
-            "exp": exp
-        }, self.refresh_secret, self.algorithm)
+        return jwt.encode(
+            self._claims(sub, exp), self.refresh_secret, self.algorithm
+        )
 
     def decode_jwt(self, token: str, type="access") -> dict:
         """
         Returns the payload of a JSON web token. 
         Raises exceptions if invalid or expired token given.
+
+        With a claims cache, the payload of a token already verified is
+        returned without verifying it again, until the token expires.
+        With token epochs, tokens issued before the last revocation of all
+        tokens of their user are rejected
         
         Args:
             token (str): JWT in string format
@@ -50,7 +87,8 @@ class TokenService():
         Raises:
             ValueError: if "type" given is not 'access' or 'refresh'
             ExpiredToken: if token already expired
-            InvalidToken: if given string is not a JWT or is not coded with the "type" given
+            InvalidToken: if given string is not a JWT or is not coded with the "type" given,
+                or if it was revoked
         """
         if type == "access":
             secret = self.access_secret
@@ -59,13 +97,27 @@ class TokenService():
         else:
             raise ValueError("Invalid token type")
 
+        algorithm = self.algorithm
+
+        key = None
+        if self.claims_cache is not None:
+            key = (type, hashlib.sha256(token.encode()).digest())
+            payload = self.claims_cache.get(key)
+
+            if payload is not None:
+                return self._check_epoch(dict(payload))
+
         try:
+            if type == "access" and self.access_keys is not None:
+                kid = jwt.get_unverified_header(token).get("kid")
+                secret = self.access_keys.verification_key(kid)
+                algorithm = self.access_keys.algorithm
+
             payload = jwt.decode(
                 token,
                 secret,
-                algorithms=[self.algorithm]
+                algorithms=[algorithm]
             )
-            return payload
 
         except jwt.ExpiredSignatureError:
             raise ExpiredToken("Token expired")
@@ -73,6 +125,36 @@ class TokenService():
         except jwt.InvalidTokenError:
             raise InvalidToken("Invalid token")
 
+        if key is not None and "exp" in payload:
+            ttl = payload["exp"] - time.time()
+            if ttl > 0:
+                self.claims_cache.set(key, dict(payload), ttl=ttl)
+
+        return self._check_epoch(payload)
+
+    def _check_epoch(self, payload: dict) -> dict:
+        """Returns payload unless its token was revoked with its user's epoch"""
+        if self.token_epochs is not None and "sub" in payload:
+            epoch = self.token_epochs.get(self.db, int(payload["sub"]))
+
+            if payload.get("gen", 0) < epoch:
+                raise InvalidToken("Token revoked")
+
+        return payload
+
+    def revoke_all_tokens(self, user_id: int) -> None:
+        """
+        Revokes every token issued to user so far, in constant time and
+        space, by bumping its token epoch
+
+        Raises:
+            FeatureDisabled: if token epochs are not enabled
+        """
+        if self.token_epochs is None:
+            raise FeatureDisabled("Revoking all tokens is not enabled")
+
+        self.token_epochs.bump(self.db, user_id)
+
     def blacklist_refresh_token(self, token: str) -> None:
         """
         Puts given refresh token into a list of Blacklisted tokens
@@ -98,40 +180,63 @@ class TokenService():
             expires_at = expires_at
         )
 
-        self.db.add(blacklisted)
-        self.db.commit()
+        try:
+            self.db.add(blacklisted)
+            self.db.commit()
+        except IntegrityError:
+            # Blacklisted concurrently, by another request
+            self.db.rollback()
+
+        if self.blacklist_filter is not None:
+            self.blacklist_filter.add(hash)
 
     def is_token_blacklisted(self, token: str) -> bool:
-        """Returns True if a token is blacklisted and False if not"""
+        """
+        Returns True if a token is blacklisted and False if not. With a
+        blacklist filter, the database is only queried when the filter
+        says the token may be blacklisted, and tokens blacklisted by other
+        processes are seen within its refresh interval. Never writes:
+        expired entries are left for cleanup_blacklist
+        """
         token_hash = hashlib.sha256(token.encode()).hexdigest()
 
-        entry = self.db.query(BlacklistedToken).filter_by(
-            token_hash=token_hash
-        ).first()
-
-        if not entry:
+        if self.blacklist_filter is not None and \
+                not self.blacklist_filter.might_contain(self.db, token_hash):
             return False
 
-        if entry.expires_at.tzinfo is None:
-            expires_at_aware = entry.expires_at.replace(tzinfo=timezone.utc)
-        else:
-            expires_at_aware = entry.expires_at
-
-        if expires_at_aware < datetime.now(tz=timezone.utc):
-            self.db.delete(entry)
-            self.db.commit()
-            return False
+        entry = self.db.execute(
+            select(BlacklistedToken.id).where(
+                BlacklistedToken.token_hash == token_hash,
+                BlacklistedToken.expires_at >= datetime.now(tz=timezone.utc)
+            )
+        ).first()
 
-        return True
+        return entry is not None
 
-    def cleanup_blacklist(self) -> None:
+    def cleanup_blacklist(self, batch_size: int = 1000) -> int:
         """
-        Clean up token blacklist removing expired tokens
+        Removes expired tokens from the blacklist, committing every
+        batch_size rows so no transaction holds many locks at once
+
+        Returns:
+            deleted (int): number of removed tokens
         """
+        now = datetime.now(tz=timezone.utc)
+        deleted = 0
+
+        while True:
+            expired = select(BlacklistedToken.id)\
+                .where(BlacklistedToken.expires_at < now)\
+                .limit(batch_size)\
+                .scalar_subquery()
+
+            count = self.db.execute(
+                delete(BlacklistedToken)
+                .where(BlacklistedToken.id.in_(expired))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            self.db.commit()
 
-        self.db.execute(
-            text("""
-            DELETE FROM blacklisted_tokens
-            WHERE expires_at < now()
-            """)
-        )
+            deleted += count
+            if count < batch_size:
+                return deleted
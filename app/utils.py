@@ -2,25 +2,105 @@
 Utility decorator functions
 """
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g
 from app.extensions import limiter
-from app.errors import InvalidToken, Unauthorized
+from app.errors import InvalidToken, Unauthorized, ServiceError
+from app.models.task import TASK_FIELDS, TASK_SORTS, TaskStatus
+import base64
+import binascii
+import codecs
 import json
+import time
 
 
 def limit_requests(limit: str):
     def decorator(f):
-        @wraps(f)
+        # wraps first, so the limiter registers the limit under the name
+        # of the view instead of one name shared by every limited view
         @limiter.limit(limit)
+        @wraps(f)
         def wrapped(*args, **kwargs):
             return f(*args, **kwargs)
         return wrapped
     return decorator
 
 
+TOTAL_MODES = ("true", "false", "estimated")
+STATUS_VALUES = tuple(status.value for status in TaskStatus)
+
+
+def encode_cursor(last_id: int, sort: str = "id", key=None) -> str:
+    """
+    Returns an opaque pagination cursor pointing after the task with last_id.
+    When sorting by another field, key is the value of that field in the
+    last task
+    """
+    payload = {"id": last_id}
+
+    if sort != "id":
+        payload.update({"sort": sort, "key": key})
+
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str = "id") -> tuple:
+    """
+    Returns the task id and sort key encoded in a cursor created by
+    encode_cursor
+
+    Returns:
+        (last_id, key) (tuple)
+
+    Raises:
+        ValueError: if the cursor is malformed or was created for another
+            ordering than sort
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = payload["id"]
+        cursor_sort = payload.get("sort", "id")
+        key = payload.get("key")
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+            KeyError, AttributeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(last_id, int) or isinstance(last_id, bool):
+        raise ValueError("Invalid cursor")
+
+    if cursor_sort != sort:
+        raise ValueError("Cursor does not match sort")
+
+    if sort.lstrip("-") == "status" and key not in STATUS_VALUES:
+        raise ValueError("Invalid cursor")
+
+    if sort.lstrip("-") == "title" and not isinstance(key, str):
+        raise ValueError("Invalid cursor")
+
+    if sort == "rank" and (
+        not isinstance(key, (int, float)) or isinstance(key, bool)
+    ):
+        raise ValueError("Invalid cursor")
+
+    return last_id, key
+
+
+def parse_fields(fields: str) -> tuple[str]:
+    """
+    Returns the field names of a comma separated sparse fieldset
+    (e.g. "id,title,status"), without duplicates and in the given order
+    """
+    names = (name.strip() for name in fields.split(","))
+    return tuple(dict.fromkeys(name for name in names if name))
+
+
 def validate_query_parameters():
     errors = []
-    allowed_params = {"page", "limit"}
+    allowed_params = {
+        "page", "limit", "cursor", "include_total", "fields",
+        "status", "tag", "sort"
+    }
     received_params = set(request.args.keys())
     extra_params = received_params - allowed_params
 
@@ -33,6 +113,69 @@ def validate_query_parameters():
     if limit < 1:
         errors.append(f"Invalid value for limit '{limit}' (should be higher than 0)")
 
+    if "cursor" in request.args:
+        if "page" in request.args:
+            errors.append("Parameters 'page' and 'cursor' cannot be combined")
+
+        try:
+            decode_cursor(request.args["cursor"], request.args.get("sort", "id"))
+        except ValueError:
+            errors.append("Invalid value for cursor")
+
+    status = request.args.get("status")
+    if status is not None and status not in STATUS_VALUES:
+        errors.append(
+            f"Invalid value for status '{status}' "
+            f"(should be one of {', '.join(STATUS_VALUES)})"
+        )
+
+    sort = request.args.get("sort", "id")
+    if sort not in TASK_SORTS:
+        errors.append(
+            f"Invalid value for sort '{sort}' "
+            f"(should be one of {', '.join(TASK_SORTS)})"
+        )
+
+    include_total = request.args.get("include_total", "true")
+    if include_total not in TOTAL_MODES:
+        errors.append(
+            f"Invalid value for include_total '{include_total}' "
+            f"(should be one of {', '.join(TOTAL_MODES)})"
+        )
+
+    if "fields" in request.args:
+        unknown_fields = set(parse_fields(request.args["fields"])) - set(TASK_FIELDS)
+        if unknown_fields:
+            errors.append(f"Unknown fields: {', '.join(sorted(unknown_fields))}")
+
+    if extra_params:
+        errors.append(f"Unexpected parameters: {', '.join(extra_params)}")
+
+    if not errors:
+        return True, None
+
+    return False, errors
+
+
+def validate_search_parameters():
+    errors = []
+    allowed_params = {"q", "limit", "cursor"}
+    extra_params = set(request.args.keys()) - allowed_params
+
+    if not request.args.get("q", "").strip():
+        errors.append("Missing search query 'q'")
+
+    limit = int(request.args.get("limit", "10"))
+
+    if limit < 1:
+        errors.append(f"Invalid value for limit '{limit}' (should be higher than 0)")
+
+    if "cursor" in request.args:
+        try:
+            decode_cursor(request.args["cursor"], "rank")
+        except ValueError:
+            errors.append("Invalid value for cursor")
+
     if extra_params:
         errors.append(f"Unexpected parameters: {', '.join(extra_params)}")
 
@@ -42,6 +185,114 @@ def validate_query_parameters():
     return False, errors
 
 
+def validate_suggest_parameters(max_limit: int):
+    errors = []
+    allowed_params = {"prefix", "limit"}
+    extra_params = set(request.args.keys()) - allowed_params
+
+    if not request.args.get("prefix", "").strip():
+        errors.append("Missing tag prefix 'prefix'")
+
+    limit = request.args.get("limit", "10")
+
+    if not limit.isdigit() or not 0 < int(limit) <= max_limit:
+        errors.append(f"Invalid value for limit '{limit}' (should be between 1 and {max_limit})")
+
+    if extra_params:
+        errors.append(f"Unexpected parameters: {', '.join(extra_params)}")
+
+    if not errors:
+        return True, None
+
+    return False, errors
+
+
+def iter_ndjson(stream):
+    """
+    Yields (line_number, item, error) for each non-blank line of a
+    newline delimited JSON stream, reading it one line at a time.
+    error is None when the line holds valid JSON
+    """
+    for number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            yield number, json.loads(line), None
+        except ValueError:
+            yield number, None, "Invalid JSON"
+
+
+def iter_json_array(stream, chunk_size: int = 64 * 1024,
+                    max_item_size: int = 1024 * 1024):
+    """
+    Yields (position, item, error) for each element of a JSON array read
+    incrementally from stream, so the whole body is never held in memory.
+    A syntax error ends the iteration, as the rest of the array cannot be
+    trusted after it
+    """
+    decode = codecs.getincrementaldecoder("utf-8")(errors="replace").decode
+    decoder = json.JSONDecoder()
+    buffer, eof = "", False
+    expected = "["
+    position = 0
+
+    while True:
+        buffer = buffer.lstrip()
+
+        if not buffer or expected == "item":
+            if not buffer and eof:
+                if expected != "end":
+                    yield position + 1, None, "Unexpected end of JSON array"
+                return
+
+            if expected == "item":
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except ValueError:
+                    if eof or len(buffer) > max_item_size:
+                        yield position + 1, None, "Invalid JSON"
+                        return
+                else:
+                    position += 1
+                    yield position, item, None
+                    buffer = buffer[end:]
+                    expected = "separator"
+                    continue
+
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += decode(chunk, final=eof)
+            continue
+
+        if expected == "[":
+            if buffer[0] != "[":
+                yield 1, None, "Body must be a JSON array"
+                return
+
+            buffer = buffer[1:]
+            expected = "item_or_end"
+
+        elif expected == "end":
+            yield position + 1, None, "Unexpected data after JSON array"
+            return
+
+        elif buffer[0] == "]" and expected in ("item_or_end", "separator"):
+            buffer = buffer[1:]
+            expected = "end"
+
+        elif expected == "item_or_end":
+            expected = "item"
+
+        elif buffer[0] == ",":
+            buffer = buffer[1:]
+            expected = "item"
+
+        else:
+            yield position + 1, None, "Invalid JSON"
+            return
+
+
 def require_json_fields(required: set):
     def decorator(f):
         @wraps(f)
@@ -73,7 +324,10 @@ def get_jwt(request) -> str:
     if not auth_header:
         raise Unauthorized()
 
-    token = auth_header.split(" ")[1]
+    _, _, token = auth_header.partition(" ")
+
+    if not token:
+        raise InvalidToken("Invalid token")
 
     token_service = current_app.token_service
 
@@ -83,12 +337,73 @@ def get_jwt(request) -> str:
     return token
 
 
+def authenticate() -> int:
+    """
+    Verifies the access token of the current request and returns the id of
+    its user. The token is only checked once per request: claims are kept
+    in g.jwt_claims and the user id in g.user_id, or the error in
+    g.auth_error, and the time it took in g.auth_duration
+
+    Raises:
+        - Unauthorized: if the request has no token or it is not valid
+    """
+    if "auth_error" in g:
+        raise g.auth_error
+
+    if "user_id" in g:
+        return g.user_id
+
+    started_at = time.perf_counter()
+
+    try:
+        claims = current_app.token_service.decode_jwt(get_jwt(request))
+        g.jwt_claims = claims
+        g.user_id = int(claims["sub"])
+        return g.user_id
+
+    except ServiceError as e:
+        g.auth_error = e
+        raise
+
+    finally:
+        g.auth_duration = time.perf_counter() - started_at
+
+
+def resolve_auth() -> None:
+    """
+    before_request hook authenticating requests to views that require
+    login, registered before the rate limiter so limits are keyed by user.
+    Errors are left for the view to raise
+    """
+    # g outlives the request when an app context was already pushed
+    for name in ("user_id", "jwt_claims", "auth_error", "auth_duration"):
+        g.pop(name, None)
+
+    view = current_app.view_functions.get(request.endpoint)
+
+    if getattr(view, "login_required", False):
+        try:
+            authenticate()
+        except ServiceError:
+            pass
+
+
+def add_auth_timing(response):
+    """after_request hook reporting the time spent authenticating"""
+    if "auth_duration" in g:
+        response.headers.add(
+            "Server-Timing", f"auth;dur={g.auth_duration * 1000:.3f}"
+        )
+
+    return response
+
+
 def login_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
-        token_service = current_app.token_service
-        user_id = token_service.decode_jwt(
-            get_jwt(request)
-        )["sub"]
-        return f(user_id=int(user_id), *args, **kwargs)
-    return wrapper
\ No newline at end of file
+        return f(user_id=authenticate(), *args, **kwargs)
+
+    # Lets resolve_auth know the view needs a user, also through the
+    # decorators wrapping this one
+    wrapper.login_required = True
+    return wrapper
@@ -0,0 +1,101 @@
+"""task full text search
+
+Revision ID: 9fb71bfeaa91
+Revises: 52d92afd5284
+Create Date: 2026-10-18 19:10:42.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9fb71bfeaa91'
+down_revision = '52d92afd5284'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = (
+    """
+    CREATE VIRTUAL TABLE tasks_fts USING fts5(
+        title, description, user_id,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts (rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER tasks_fts_update
+    AFTER UPDATE OF title, description ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, title, description, user_id)
+        VALUES ('delete', old.id, old.title, old.description, old.user_id);
+        INSERT INTO tasks_fts (rowid, title, description, user_id)
+        VALUES (new.id, new.title, new.description, new.user_id);
+    END
+    """,
+    # Index the tasks that already exist
+    "INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')",
+)
+
+SQLITE_DOWNGRADE = (
+    "DROP TRIGGER tasks_fts_update",
+    "DROP TRIGGER tasks_fts_delete",
+    "DROP TRIGGER tasks_fts_insert",
+    "DROP TABLE tasks_fts",
+)
+
+POSTGRESQL_UPGRADE = (
+    """
+    ALTER TABLE tasks ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX ix_tasks_search_vector ON tasks USING GIN (search_vector)",
+)
+
+POSTGRESQL_DOWNGRADE = (
+    "DROP INDEX ix_tasks_search_vector",
+    "ALTER TABLE tasks DROP COLUMN search_vector",
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        statements = SQLITE_UPGRADE
+    elif dialect == 'postgresql':
+        statements = POSTGRESQL_UPGRADE
+    else:
+        return
+
+    for statement in statements:
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        statements = SQLITE_DOWNGRADE
+    elif dialect == 'postgresql':
+        statements = POSTGRESQL_DOWNGRADE
+    else:
+        return
+
+    for statement in statements:
+        op.execute(statement)
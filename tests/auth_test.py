@@ -1,5 +1,15 @@
+import pytest
 from flask.testing import FlaskClient
 from werkzeug.test import TestResponse
+from datetime import datetime, timedelta, timezone
+from app import db
+from app.errors import ExpiredToken, InvalidToken
+from app.models import BlacklistedToken
+from app.services.blacklist_filter import BlacklistFilter
+from app.services.token_epochs import TokenEpochs
+from app.services.key_ring import KeyRing
+import hashlib
+import jwt
 
 def test_register_with_missing_fields(client: FlaskClient):
     response: TestResponse = client.post('/register', json = {})
@@ -117,4 +127,273 @@ def test_logout(client, existing_user_tokens):
     refresh_headers = {"Authorization": f"Bearer {existing_user_tokens["refresh_token"]}"}
     refresh_attempt = client.post('/refresh', headers=refresh_headers)
 
-    assert refresh_attempt.status_code == 401
\ No newline at end of file
+    assert refresh_attempt.status_code == 401
+
+def test_authenticated_requests_skip_blacklist_query(client, existing_user_tokens,
+                                                     count_queries):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    client.get("/todos", headers=headers)
+
+    with count_queries() as statements:
+        assert client.get("/todos", headers=headers).status_code == 200
+
+    assert not [s for s in statements if "blacklisted_tokens" in s]
+
+
+def test_blacklist_filter_sees_tokens_blacklisted_elsewhere(app, token_service,
+                                                            valid_refresh_token):
+    blacklist_filter = BlacklistFilter(refresh_interval=0)
+    token_hash = hashlib.sha256(valid_refresh_token.encode()).hexdigest()
+    assert not blacklist_filter.might_contain(db.session, token_hash)
+
+    # Row added by another process, without going through this filter
+    db.session.add(BlacklistedToken(
+        token_hash=token_hash,
+        expires_at=datetime.now(tz=timezone.utc) + timedelta(days=1)
+    ))
+    db.session.commit()
+
+    assert blacklist_filter.might_contain(db.session, token_hash)
+    assert len(blacklist_filter) == 1
+
+
+def test_refresh_tokens_blacklisted_elsewhere_are_rejected(client, token_service,
+                                                           valid_refresh_token):
+    def sha256(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    expires_at = datetime.now(tz=timezone.utc) + timedelta(days=1)
+    db.session.add(BlacklistedToken(id=10, token_hash=sha256("other"),
+                                    expires_at=expires_at))
+    db.session.commit()
+
+    token_service.blacklist_filter = BlacklistFilter(refresh_interval=0)
+    token_service.blacklist_filter.refresh(db.session)
+
+    # Committed by another process after the filter saw a higher id
+    db.session.add(BlacklistedToken(id=5, token_hash=sha256(valid_refresh_token),
+                                    expires_at=expires_at))
+    db.session.commit()
+
+    headers = {"Authorization": f"Bearer {valid_refresh_token}"}
+    assert client.post("/refresh", headers=headers).status_code == 401
+
+    # Logging out again is not an error
+    response = client.post("/logout", json={"refresh_token": valid_refresh_token})
+    assert response.status_code == 200
+
+
+def test_decoded_claims_are_cached_until_expiry(token_service, existing_user,
+                                                expired_token_generator):
+    access_token = token_service.new_access_token(existing_user.id)
+    cache = token_service.claims_cache
+    cache.clear()
+
+    payload = token_service.decode_jwt(access_token)
+    payload["sub"] = "tampered"
+    assert token_service.decode_jwt(access_token)["sub"] == str(existing_user.id)
+    assert cache.stats()["hits"] >= 1
+
+    # A token is only cached for the type it was verified as
+    with pytest.raises(InvalidToken):
+        token_service.decode_jwt(access_token, "refresh")
+
+    expired = expired_token_generator(token_service.access_secret, existing_user.id)
+    with pytest.raises(ExpiredToken):
+        token_service.decode_jwt(expired)
+    assert len(cache) == 1
+
+
+def test_purge_blacklist_removes_expired_tokens_in_batches(app, token_service,
+                                                           count_queries):
+    def sha256(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    now = datetime.now(tz=timezone.utc)
+    db.session.add_all([
+        BlacklistedToken(token_hash=sha256(f"expired{i}"),
+                         expires_at=now - timedelta(hours=1))
+        for i in range(5)
+    ] + [BlacklistedToken(token_hash=sha256("valid"),
+                          expires_at=now + timedelta(hours=1))])
+    db.session.commit()
+
+    # Lookups of expired tokens do not write
+    token_service.blacklist_filter = None
+    with count_queries() as statements:
+        assert not token_service.is_token_blacklisted("expired0")
+    assert len(statements) == 1 and statements[0].startswith("SELECT")
+
+    result = app.test_cli_runner().invoke(args=["purge-blacklist", "--batch-size", "2"])
+    assert "Removed 5 expired blacklisted tokens" in result.output
+
+    remaining = db.session.execute(
+        db.select(BlacklistedToken.token_hash)
+    ).scalars().all()
+    assert remaining == [sha256("valid")]
+
+
+def test_logout_all_revokes_every_token(client, existing_user, token_service):
+    tokens = [
+        (token_service.new_access_token(existing_user.id),
+         token_service.new_refresh_token(existing_user.id))
+        for _ in range(2)
+    ]
+    headers = {"Authorization": f"Bearer {tokens[0][0]}"}
+
+    assert client.post("/logout-all", headers=headers).status_code == 200
+
+    for access_token, refresh_token in tokens:
+        assert client.get("/todos", headers={
+            "Authorization": f"Bearer {access_token}"
+        }).status_code == 401
+        assert client.post("/refresh", headers={
+            "Authorization": f"Bearer {refresh_token}"
+        }).status_code == 401
+
+    # Tokens issued afterwards are valid
+    new_token = token_service.new_access_token(existing_user.id)
+    assert client.get("/todos", headers={
+        "Authorization": f"Bearer {new_token}"
+    }).status_code == 200
+
+
+def test_deleted_user_tokens_are_revoked(client, existing_user_tokens):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+
+    response = client.delete("/user", json={"password": "password123"},
+                             headers=headers)
+    assert response.status_code == 204
+
+    assert client.get("/todos", headers=headers).status_code == 401
+
+
+def test_token_epochs_refresh_from_database(app, existing_user):
+    epochs = TokenEpochs(refresh_interval=0)
+    assert epochs.get(db.session, existing_user.id) == 0
+
+    # Bumped by another process
+    TokenEpochs().bump(db.session, existing_user.id)
+
+    assert epochs.get(db.session, existing_user.id) == 1
+    assert epochs.current(db.session, existing_user.id) == 1
+
+
+def test_token_epochs_bump_without_upsert(app, existing_user):
+    epochs = TokenEpochs()
+    now = datetime.now(tz=timezone.utc)
+
+    # Path of the dialects without ON CONFLICT
+    assert epochs._select_and_bump(db.session, existing_user.id, now) == 1
+    assert epochs._select_and_bump(db.session, existing_user.id, now) == 2
+    db.session.commit()
+
+    assert epochs.current(db.session, existing_user.id) == 2
+
+
+def test_logout_all_without_token_epochs(client, existing_user_tokens,
+                                         token_service):
+    token_service.token_epochs = None
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+
+    assert client.post("/logout-all", headers=headers).status_code == 501
+
+    # Deleting the account does not depend on them
+    response = client.delete("/user", json={"password": "password123"},
+                             headers=headers)
+    assert response.status_code == 204
+
+
+def generate_pem_keys(*kids) -> dict:
+    pytest.importorskip("cryptography")
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+
+    return {
+        kid: ed25519.Ed25519PrivateKey.generate().private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        for kid in kids
+    }
+
+
+def test_jwks_empty_with_shared_secret(client):
+    response = client.get("/.well-known/jwks.json")
+
+    assert response.status_code == 200
+    assert response.get_json() == {"keys": []}
+
+
+def test_access_tokens_signed_with_rotating_key_ring(client, token_service,
+                                                     existing_user):
+    pem_keys = generate_pem_keys("2025-01", "2025-02")
+    hs256_token = token_service.new_access_token(existing_user.id)
+
+    token_service.access_keys = KeyRing("EdDSA", pem_keys, "2025-01")
+    old_token = token_service.new_access_token(existing_user.id)
+    assert jwt.get_unverified_header(old_token)["kid"] == "2025-01"
+
+    # New key becomes active, tokens signed with the old one still verify
+    token_service.access_keys = KeyRing("EdDSA", pem_keys, "2025-02")
+    new_token = token_service.new_access_token(existing_user.id)
+
+    for token in (old_token, new_token):
+        assert client.get("/todos", headers={
+            "Authorization": f"Bearer {token}"
+        }).status_code == 200
+
+    assert client.get("/todos", headers={
+        "Authorization": f"Bearer {hs256_token}"
+    }).status_code == 401
+
+    keys = client.get("/.well-known/jwks.json").get_json()["keys"]
+    assert {key["kid"] for key in keys} == {"2025-01", "2025-02"}
+    assert all(key["alg"] == "EdDSA" and "d" not in key for key in keys)
+
+    # Once the old key is removed, its tokens are rejected
+    del pem_keys["2025-01"]
+    token_service.access_keys = KeyRing("EdDSA", pem_keys, "2025-02")
+    token_service.claims_cache.clear()
+    with pytest.raises(InvalidToken):
+        token_service.decode_jwt(old_token)
+
+
+def test_rate_limits_are_keyed_by_user(client, existing_user_tokens,
+                                       alt_valid_access_token):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    task = {"title": "Task", "description": ""}
+
+    statuses = [
+        client.post("/todos", json=task, headers=headers).status_code
+        for _ in range(51)
+    ]
+    assert statuses.count(201) == 50 and statuses[-1] == 429
+
+    # Another user behind the same address is not throttled
+    alt_headers = {"Authorization": f"Bearer {alt_valid_access_token}"}
+    assert client.post("/todos", json=task, headers=alt_headers).status_code != 429
+
+
+def test_token_decoded_once_per_request(client, existing_user_tokens,
+                                        token_service):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    decode_jwt = token_service.decode_jwt
+    calls = []
+
+    def counting_decode_jwt(*args, **kwargs):
+        calls.append(args)
+        return decode_jwt(*args, **kwargs)
+
+    token_service.decode_jwt = counting_decode_jwt
+    response = client.get("/todos", headers=headers)
+
+    assert response.status_code == 200
+    assert len(calls) == 1
+    assert response.headers["Server-Timing"].startswith("auth;dur=")
+
+    # Public endpoints are not authenticated
+    calls.clear()
+    client.get("/.well-known/jwks.json", headers=headers)
+    assert calls == []
@@ -0,0 +1,54 @@
+from app.cache import LRUCache
+import time
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire():
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=0.01)
+
+    time.sleep(0.02)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+
+def test_size_limit():
+    cache = LRUCache(max_entries=10, max_bytes=1000)
+    cache.set("a", "x" * 400)
+    cache.set("b", "x" * 400)
+    cache.set("c", "x" * 400)
+
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] <= 1000
+
+    # Values larger than the whole cache are not cached
+    cache.set("d", "x" * 2000)
+    assert cache.get("d") is None
+
+
+def test_group_invalidation():
+    cache = LRUCache(max_entries=10)
+    cache.set(("user", 1, "page"), [1], group=1)
+    cache.set(("user", 1, "count"), 1, group=1)
+    cache.set(("user", 2, "page"), [2], group=2)
+
+    cache.invalidate_group(1)
+
+    assert len(cache) == 1
+    assert cache.get(("user", 2, "page")) == [2]
+    assert cache.stats()["hits"] == 1
@@ -5,6 +5,8 @@ from app.models import User
 import jwt
 from datetime import datetime, timedelta, timezone
 from flask import current_app
+from contextlib import contextmanager
+from sqlalchemy import event
 
 
 # ───────────────────────────────
@@ -31,6 +33,25 @@ def client(app):
     yield app.test_client()
 
 
+@pytest.fixture
+def count_queries(app):
+    @contextmanager
+    def _count():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    yield _count
+
+
 # ───────────────────────────────
 # SERVICES
 # ───────────────────────────────
@@ -0,0 +1,69 @@
+from app import create_app
+from app.config import TestConfig
+from app.rate_limit_storage import SQLiteStorage
+from limits import parse
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+from multiprocessing import get_context
+
+
+def test_counters_are_shared_between_storages(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    first, second = SQLiteStorage(uri), SQLiteStorage(uri)
+
+    assert first.incr("key", 60) == 1
+    assert second.incr("key", 60, amount=2) == 3
+    assert first.get("key") == 3
+    assert second.get_expiry("key") > first.get_expiry("missing")
+
+    second.clear("key")
+    assert first.get("key") == 0
+
+
+def test_expired_counter_starts_over(tmp_path):
+    storage = SQLiteStorage(f"sqlite:///{tmp_path / 'limits.db'}")
+
+    storage.incr("key", -1)
+    assert storage.get("key") == 0
+    assert storage.incr("key", 60) == 1
+
+
+def test_limiters_on_sqlite_storage(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    limit = parse("3 per minute")
+
+    for strategy in (FixedWindowRateLimiter, SlidingWindowCounterRateLimiter):
+        first = strategy(SQLiteStorage(uri))
+        second = strategy(SQLiteStorage(uri))
+
+        assert first.hit(limit, strategy.__name__)
+        assert second.hit(limit, strategy.__name__)
+        assert first.hit(limit, strategy.__name__)
+        assert not second.hit(limit, strategy.__name__)
+        assert second.get_window_stats(limit, strategy.__name__).remaining == 0
+
+
+def _hit_many(uri: str, hits: int) -> int:
+    limiter = SlidingWindowCounterRateLimiter(SQLiteStorage(uri))
+    limit = parse("50 per minute")
+    return sum(limiter.hit(limit, "shared") for _ in range(hits))
+
+
+def test_limit_holds_across_processes(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    SQLiteStorage(uri)
+
+    with get_context("spawn").Pool(4) as pool:
+        accepted = pool.starmap(_hit_many, [(uri, 30)] * 4)
+
+    assert sum(accepted) == 50
+
+
+def test_app_uses_configured_storage(tmp_path):
+    class SQLiteLimitsConfig(TestConfig):
+        RATELIMIT_STORAGE_URI = f"sqlite:///{tmp_path / 'limits.db'}"
+
+    app = create_app(SQLiteLimitsConfig)
+    client = app.test_client()
+
+    statuses = [client.post("/login", json={}).status_code for _ in range(6)]
+    assert statuses.count(429) == 1
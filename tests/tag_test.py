@@ -0,0 +1,82 @@
+from flask.testing import FlaskClient
+
+
+def create_tagged_tasks(client, headers, tag_lists) -> list[int]:
+    task_ids = []
+    for tags in tag_lists:
+        task_id = client.post("/todos", json={
+            "title": "Task", "description": "With tags"
+        }, headers=headers).get_json()["id"]
+        client.patch(f"/todos/{task_id}", json={"tags": tags}, headers=headers)
+        task_ids.append(task_id)
+    return task_ids
+
+
+def test_get_tags_with_usage(client: FlaskClient, existing_user_tokens: dict,
+                             alt_valid_access_token: str):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    task_ids = create_tagged_tasks(
+        client, headers, [["work", "home"], ["work"], ["urgent"]]
+    )
+
+    # Unused tags are listed too
+    client.patch(f"/todos/{task_ids[2]}", json={"tags": []}, headers=headers)
+
+    response = client.get("/tags", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["data"] == [
+        {"name": "work", "count": 2},
+        {"name": "home", "count": 1},
+        {"name": "urgent", "count": 0},
+    ]
+
+    alt_headers = {"Authorization": f"Bearer {alt_valid_access_token}"}
+    assert client.get("/tags", headers=alt_headers).get_json()["data"] == []
+
+
+def test_suggest_tags_by_prefix(client: FlaskClient, existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    create_tagged_tasks(client, headers, [
+        ["work", "workout", "wo"], ["workout"], ["word", "home"]
+    ])
+
+    body = client.get("/tags/suggest?prefix=Wor", headers=headers).get_json()
+    assert [tag["name"] for tag in body["data"]] == ["workout", "word", "work"]
+
+    body = client.get("/tags/suggest?prefix=wo&limit=2", headers=headers).get_json()
+    assert [tag["name"] for tag in body["data"]] == ["workout", "wo"]
+
+    body = client.get("/tags/suggest?prefix=x", headers=headers).get_json()
+    assert body["data"] == []
+
+
+def test_suggest_tags_with_last_code_points(client: FlaskClient,
+                                            existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    create_tagged_tasks(client, headers, [
+        ["a\U0010ffff", "a\U0010ffffb", "a\ud7ffc", "a\ue000"]
+    ])
+
+    # No code point follows U+10FFFF, and surrogates are skipped after U+D7FF
+    for prefix, expected in (("a\U0010ffff", ["a\U0010ffff", "a\U0010ffffb"]),
+                             ("a\ud7ff", ["a\ud7ffc"])):
+        response = client.get("/tags/suggest", query_string={"prefix": prefix},
+                              headers=headers)
+        assert response.status_code == 200
+        assert sorted(tag["name"] for tag in response.get_json()["data"]) == expected
+
+
+def test_suggest_tags_invalid_parameters(client: FlaskClient,
+                                         existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+
+    for query in ("", "?prefix=+", "?prefix=a&limit=0", "?prefix=a&limit=51",
+                  "?prefix=a&limit=x", "?prefix=a&page=1"):
+        response = client.get(f"/tags/suggest{query}", headers=headers)
+        assert response.status_code == 400
+        assert "errors" in response.get_json()
+
+
+def test_tags_require_token(client: FlaskClient):
+    assert client.get("/tags").status_code == 401
+    assert client.get("/tags/suggest?prefix=a").status_code == 401
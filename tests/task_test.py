@@ -1,5 +1,10 @@
+import csv
+import io
+import json
 from flask.testing import FlaskClient
 from werkzeug.test import TestResponse
+from sqlalchemy import event
+from app import db
 
 task = { "title": "Buy groceries", "description": "Buy milk, eggs, and bread" }
 task_2 = { "title": "Buy groceries", "description": "Buy milk, eggs, bread and cheese" }
@@ -187,9 +192,588 @@ def test_mark_task_done(client, existing_user_tokens):
     assert updated_task["status"] == "done"
 
 
+def test_rate_limits_are_counted_per_endpoint(client: FlaskClient,
+                                             existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+
+    for _ in range(50):
+        client.post("/todos", json=task, headers=headers)
+
+    assert client.post("/todos", json=task, headers=headers).status_code == 429
+
+    # Listing keeps its own quota, neither used up by creating tasks nor
+    # capped by the limit of creating them
+    statuses = {client.get("/todos", headers=headers).status_code
+                for _ in range(60)}
+    assert statuses == {200}
+
+
 def test_update_task_tags_replaces_old_tags(task_service, task):
-    task_service._update_task_tags(task, ["work"])
-    task_service._update_task_tags(task, ["urgent"])
+    task_service._update_task_tags(task.user_id, task.id, ["work"])
+    task_service._update_task_tags(task.user_id, task.id, ["urgent"])
+    task_service.session.expire(task, ["tags"])
 
     tags = task_service.get_task(task.id).tags
     assert [t.name for t in tags] == ["urgent"]
+
+
+def test_get_todos_with_cursor(client: FlaskClient, existing_user_tokens: dict,
+                               user_id_from_token: int, tasks_creator):
+    tasks_creator(user_id_from_token, [
+        {"title": f"Task {i}", "description": ""} for i in range(5)
+    ])
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+
+    first_page = client.get("/todos?limit=2", headers=headers).get_json()
+    seen = [t["id"] for t in first_page["data"]]
+    cursor = first_page["next_cursor"]
+
+    while cursor:
+        response = client.get(f"/todos?limit=2&cursor={cursor}", headers=headers)
+        assert response.status_code == 200
+
+        body = response.get_json()
+        seen += [t["id"] for t in body["data"]]
+        cursor = body["next_cursor"]
+
+    # Every task is listed exactly once and in order
+    assert len(seen) == 5
+    assert seen == sorted(seen)
+
+
+def test_get_todos_with_invalid_cursor(client: FlaskClient,
+                                       access_token_of_user_with_tasks: str):
+    headers = {"Authorization": f"Bearer {access_token_of_user_with_tasks}"}
+
+    response = client.get("/todos?cursor=invalid", headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == ["Invalid value for cursor"]
+
+    response = client.get("/todos?page=1&cursor=eyJpZCI6MX0", headers=headers)
+    assert response.status_code == 400
+
+
+def test_get_todos_without_total(client: FlaskClient,
+                                 access_token_of_user_with_tasks: str):
+    headers = {"Authorization": f"Bearer {access_token_of_user_with_tasks}"}
+    response = client.get("/todos?limit=1&include_total=false", headers=headers)
+
+    assert response.status_code == 200
+    body = response.get_json()
+
+    assert "total" not in body
+    assert len(body["data"]) == 1
+    assert body["has_more"] is True
+
+    body = client.get("/todos?page=2&limit=1&include_total=false",
+                      headers=headers).get_json()
+    assert body["has_more"] is False
+
+
+def test_get_todos_with_estimated_total(app, client: FlaskClient,
+                                        access_token_of_user_with_tasks: str):
+    headers = {"Authorization": f"Bearer {access_token_of_user_with_tasks}"}
+    app.config["ESTIMATED_TOTAL_CAP"] = 1
+
+    body = client.get("/todos?include_total=estimated", headers=headers).get_json()
+
+    assert body["total"] == 1
+    assert body["total_estimated"] is True
+    assert len(body["data"]) == 2
+
+
+def test_get_todos_with_sparse_fieldset(client: FlaskClient,
+                                        access_token_of_user_with_tasks: str):
+    headers = {"Authorization": f"Bearer {access_token_of_user_with_tasks}"}
+
+    response = client.get("/todos?fields=title,status", headers=headers)
+    assert response.status_code == 200
+
+    for item in response.get_json()["data"]:
+        assert set(item) == {"id", "title", "status"}
+
+    response = client.get("/todos?fields=title,secret", headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == ["Unknown fields: secret"]
+
+
+def test_get_todos_filtered_by_status_and_tag(client: FlaskClient,
+                                              existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    ids = [
+        client.post("/todos", json=task, headers=headers).get_json()["id"]
+        for _ in range(3)
+    ]
+    client.patch(f"/todos/{ids[0]}", json={"status": "done", "tags": ["work"]},
+                 headers=headers)
+    client.patch(f"/todos/{ids[1]}", json={"tags": ["Work"]}, headers=headers)
+
+    body = client.get("/todos?status=done", headers=headers).get_json()
+    assert [t["id"] for t in body["data"]] == [ids[0]]
+    assert body["total"] == 1
+
+    body = client.get("/todos?tag=work", headers=headers).get_json()
+    assert [t["id"] for t in body["data"]] == ids[:2]
+
+    body = client.get("/todos?tag=work&status=todo", headers=headers).get_json()
+    assert [t["id"] for t in body["data"]] == [ids[1]]
+
+    response = client.get("/todos?status=later&sort=name", headers=headers)
+    assert response.status_code == 400
+    assert len(response.get_json()["errors"]) == 2
+
+
+def test_get_todos_sorted_with_cursor(client: FlaskClient,
+                                      existing_user_tokens: dict,
+                                      user_id_from_token: int, tasks_creator):
+    titles = ["b", "a", "c", "a", "d"]
+    tasks_creator(user_id_from_token, [
+        {"title": title, "description": ""} for title in titles
+    ])
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+
+    for sort in ("title", "-title"):
+        seen = []
+        url = f"/todos?limit=2&fields=id&sort={sort}"
+
+        while url:
+            body = client.get(url, headers=headers).get_json()
+            assert all(set(t) == {"id"} for t in body["data"])
+            seen += [t["id"] for t in body["data"]]
+
+            cursor = body["next_cursor"]
+            url = cursor and f"/todos?limit=2&fields=id&sort={sort}&cursor={cursor}"
+
+        expected = [
+            t["id"] for t in client.get(
+                f"/todos?limit=10&sort={sort}", headers=headers
+            ).get_json()["data"]
+        ]
+        assert seen == expected
+        assert len(seen) == len(titles)
+
+    titles_desc = [
+        t["title"] for t in client.get(
+            "/todos?limit=10&sort=-title", headers=headers
+        ).get_json()["data"]
+    ]
+    assert titles_desc == sorted(titles, reverse=True)
+
+
+def test_cursor_pages_seek_through_an_index(app, task_service, user_id_from_token):
+    queries = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        if statement.startswith("SELECT") and "FROM tasks" in statement:
+            queries.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        task_service.tasks_after_id(user_id_from_token, 5, 10)
+        task_service.tasks_after_id(user_id_from_token, 5, 10, sort="title",
+                                    after_key="Buy")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    assert len(queries) == 2
+    with db.engine.connect() as connection:
+        for (statement, parameters), index in zip(
+                queries, ("ix_tasks_user_id_id", "ix_tasks_user_id_title_id")):
+            plan = " ".join(row[-1] for row in connection.exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + statement, parameters
+            ))
+            # Rows come in index order, with no sort of every task of the user
+            assert index in plan
+            assert "TEMP B-TREE" not in plan
+
+
+def test_search_todos(client: FlaskClient, existing_user_tokens: dict,
+                      user_id_from_token: int, tasks_creator,
+                      alt_valid_access_token: str):
+    tasks_creator(user_id_from_token, [
+        {"title": "Buy groceries", "description": "Milk and eggs"},
+        {"title": "Pay bills", "description": "Buy stamps for the letters"},
+        {"title": "Walk the dog", "description": "Around the park"},
+    ])
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+
+    body = client.get("/todos/search?q=buy", headers=headers).get_json()
+    # Title matches rank above description matches
+    assert [t["title"] for t in body["data"]] == ["Buy groceries", "Pay bills"]
+
+    body = client.get("/todos/search?q=buy+groc", headers=headers).get_json()
+    assert [t["title"] for t in body["data"]] == ["Buy groceries"]
+
+    body = client.get("/todos/search?q=buy&limit=1", headers=headers).get_json()
+    assert body["has_more"] is True
+    cursor = body["next_cursor"]
+    body = client.get(f"/todos/search?q=buy&limit=1&cursor={cursor}",
+                      headers=headers).get_json()
+    assert [t["title"] for t in body["data"]] == ["Pay bills"]
+    assert body["has_more"] is False
+
+    # Other users' tasks are not searched
+    other_headers = {"Authorization": f"Bearer {alt_valid_access_token}"}
+    body = client.get("/todos/search?q=buy", headers=other_headers).get_json()
+    assert body["data"] == []
+
+
+def test_search_index_follows_updates_and_deletes(client: FlaskClient,
+                                                  existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    task_id = client.post("/todos", json=task, headers=headers).get_json()["id"]
+
+    client.patch(f"/todos/{task_id}", json={"title": "Renew passport"},
+                 headers=headers)
+    assert client.get("/todos/search?q=groceries",
+                      headers=headers).get_json()["data"] == []
+    assert len(client.get("/todos/search?q=passport",
+                          headers=headers).get_json()["data"]) == 1
+
+    client.delete(f"/todos/{task_id}", headers=headers)
+    assert client.get("/todos/search?q=passport",
+                      headers=headers).get_json()["data"] == []
+
+    assert client.get("/todos/search?q=+", headers=headers).status_code == 400
+
+
+def test_export_todos(client: FlaskClient, existing_user_tokens: dict,
+                      user_id_from_token: int, tasks_creator):
+    tasks_creator(user_id_from_token)
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    task_id = client.post("/todos", json=task, headers=headers).get_json()["id"]
+    client.patch(f"/todos/{task_id}", json={"tags": ["home", "errands"]},
+                 headers=headers)
+
+    response = client.get("/todos/export", headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(lines) == 3
+    assert lines[-1]["tags"] == ["errands", "home"]
+
+    response = client.get("/todos/export?format=csv", headers=headers)
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ["id", "title", "description", "status", "tags"]
+    assert rows[-1][-1] == "errands,home"
+    assert len(rows) == 4
+
+    assert client.get("/todos/export?format=xml", headers=headers).status_code == 400
+
+
+def test_import_todos(client: FlaskClient, existing_user_tokens: dict,
+                      task_service):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    body = "\n".join([
+        json.dumps({"title": "One", "tags": ["Home", "home "]}),
+        "{not json",
+        "",
+        json.dumps({"title": "Two", "status": "done", "tags": ["home", "work"]}),
+        json.dumps({"description": "No title"}),
+    ])
+
+    response = client.post("/todos/import", data=body, headers=headers,
+                           content_type="application/x-ndjson")
+    assert response.status_code == 200
+    report = response.get_json()
+
+    assert report["imported"] == 2
+    assert [e["item"] for e in report["errors"]] == [2, 5]
+
+    response = client.post("/todos/import", headers=headers, json=[
+        {"title": "Three"}, {"title": "Four", "status": "later"}
+    ])
+    report = response.get_json()
+    assert report["imported"] == 1
+    assert report["errors"] == [{"item": 2, "message": "Status 'later' not allowed"}]
+
+    exported = [
+        json.loads(line) for line in
+        client.get("/todos/export", headers=headers).get_data(as_text=True).splitlines()
+    ]
+    assert [(t["title"], t["status"], t["tags"]) for t in exported] == [
+        ("One", "todo", ["home"]),
+        ("Two", "done", ["home", "work"]),
+        ("Three", "todo", []),
+    ]
+
+    response = client.post("/todos/import", data="x", headers=headers,
+                           content_type="text/plain")
+    assert response.status_code == 415
+
+
+def test_batch_operations(client: FlaskClient, existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    ids = [
+        client.post("/todos", json=task, headers=headers).get_json()["id"]
+        for _ in range(2)
+    ]
+
+    response = client.post("/todos/batch", headers=headers, json={"operations": [
+        {"op": "create", "data": {"title": "New", "tags": ["home"]}},
+        {"op": "update", "id": ids[0], "data": {"status": "done"}},
+        {"op": "delete", "id": ids[1]},
+    ]})
+    assert response.status_code == 200
+
+    results = response.get_json()["results"]
+    assert results[0]["task"]["title"] == "New"
+    assert results[1]["task"]["status"] == "done"
+    assert results[2] == {"op": "delete", "id": ids[1]}
+
+    listed = client.get("/todos", headers=headers).get_json()["data"]
+    assert [t["id"] for t in listed] == [ids[0], results[0]["task"]["id"]]
+
+
+def test_batch_is_atomic(client: FlaskClient, existing_user_tokens: dict,
+                         alt_valid_access_token: str):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    task_id = client.post("/todos", json=task, headers=headers).get_json()["id"]
+
+    response = client.post("/todos/batch", headers=headers, json={"operations": [
+        {"op": "update", "id": task_id, "data": {"status": "done"}},
+        {"op": "delete", "id": 0},
+    ]})
+    assert response.status_code == 404
+
+    response = client.post("/todos/batch", headers=headers, json={"operations": [
+        {"op": "create", "data": {"title": "New"}},
+        {"op": "update", "id": task_id, "data": {"status": "later"}},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Operation 1: Status 'later' not allowed"
+
+    other_headers = {"Authorization": f"Bearer {alt_valid_access_token}"}
+    response = client.post("/todos/batch", headers=other_headers, json={
+        "operations": [{"op": "delete", "id": task_id}]
+    })
+    assert response.status_code == 403
+
+    # Nothing was applied
+    listed = client.get("/todos", headers=headers).get_json()["data"]
+    assert [(t["id"], t["status"]) for t in listed] == [(task_id, "todo")]
+
+
+def test_get_todos_conditional_request(client: FlaskClient,
+                                       access_token_of_user_with_tasks: str):
+    headers = {"Authorization": f"Bearer {access_token_of_user_with_tasks}"}
+
+    response = client.get("/todos", headers=headers)
+    etag = response.headers["ETag"]
+    assert etag
+
+    response = client.get("/todos", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.get_data() == b""
+
+    # Other queries have their own ETag
+    response = client.get("/todos?limit=1", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+    task_id = client.post("/todos", json=task, headers=headers).get_json()["id"]
+    response = client.get("/todos", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    client.patch(f"/todos/{task_id}", json={"status": "done"}, headers=headers)
+    response = client.get("/todos", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_todo_changes_since_revision(client: FlaskClient, existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    first_id = client.post("/todos", json=task, headers=headers).get_json()["id"]
+
+    sync = client.get("/todos/changes?since=0", headers=headers).get_json()
+    assert [c["task"]["id"] for c in sync["changes"]] == [first_id]
+    revision = sync["revision"]
+
+    second_id = client.post("/todos", json=task_2, headers=headers).get_json()["id"]
+    client.patch(f"/todos/{first_id}", json={"tags": ["home"]}, headers=headers)
+    client.delete(f"/todos/{second_id}", headers=headers)
+
+    sync = client.get(f"/todos/changes?since={revision}&limit=1",
+                      headers=headers).get_json()
+    assert sync["has_more"] is True
+    assert [(c["type"], c["task"]["id"], c["task"]["tags"]) for c in sync["changes"]] \
+        == [("upsert", first_id, ["home"])]
+
+    sync = client.get(f"/todos/changes?since={sync['revision']}",
+                      headers=headers).get_json()
+    assert sync["has_more"] is False
+    assert [(c["type"], c["id"]) for c in sync["changes"]] == [("delete", second_id)]
+
+    # Nothing changed since the last sync
+    sync = client.get(f"/todos/changes?since={sync['revision']}",
+                      headers=headers).get_json()
+    assert sync["changes"] == []
+
+    assert client.get("/todos/changes", headers=headers).status_code == 400
+
+
+def test_get_todos_served_from_cache(app, client: FlaskClient, count_queries,
+                                     access_token_of_user_with_tasks: str):
+    headers = {"Authorization": f"Bearer {access_token_of_user_with_tasks}"}
+    first = client.get("/todos?limit=5", headers=headers).get_json()
+
+    with count_queries() as statements:
+        cached = client.get("/todos?limit=5", headers=headers).get_json()
+
+    # Only the version lookup reaches the database
+    assert cached == first
+    assert not any("FROM tasks" in statement for statement in statements)
+
+    client.post("/todos", json=task, headers=headers)
+    assert client.get("/todos?limit=5", headers=headers).get_json()["total"] == 3
+    assert app.task_service.listing_cache.stats()["hits"] == 1
+
+
+def test_get_todos_loads_tags_with_constant_queries(client: FlaskClient,
+                                                    existing_user_tokens: dict,
+                                                    count_queries):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    client.post("/todos/import", headers=headers, json=[
+        {"title": f"Task {i}", "tags": [f"tag{i}", "common"]} for i in range(12)
+    ])
+
+    query_counts = []
+    for limit in (1, 4, 12):
+        with count_queries() as statements:
+            body = client.get(f"/todos?limit={limit}", headers=headers).get_json()
+
+        assert len(body["data"]) == limit
+        assert body["data"][0]["tags"] == ["common", "tag0"]
+        query_counts.append(len(statements))
+
+    assert len(set(query_counts)) == 1
+
+    body = client.get("/todos?fields=title", headers=headers).get_json()
+    assert "tags" not in body["data"][0]
+
+
+def test_created_todo_includes_tags(client: FlaskClient, existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    created = client.post("/todos", json=task, headers=headers).get_json()
+
+    assert created["tags"] == []
+
+
+def test_update_task_tags_statements_do_not_grow_with_tags(task_service, task,
+                                                           count_queries):
+    task_service._update_task_tags(task.user_id, task.id, ["old"])
+
+    counts = []
+    for names in (["a"], [f"tag{i}" for i in range(20)]):
+        with count_queries() as statements:
+            task_service._update_task_tags(task.user_id, task.id, names)
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
+
+    # Unchanged links are kept, changed ones are replaced
+    task_service._update_task_tags(task.user_id, task.id, ["tag0", "tag1", "new"])
+    task_service.session.expire(task, ["tags"])
+    tag_ids = {t.name: t.id for t in task.tags}
+    assert set(tag_ids) == {"tag0", "tag1", "new"}
+    assert task_service.get_or_create_tag(task.user_id, "tag0") == tag_ids["tag0"]
+
+
+def test_tag_ids_are_cached_after_commit(task_service, task, count_queries):
+    user_id, task_id = task.user_id, task.id
+    task_service.tag_cache.clear()
+    task_service.update_task(user_id, task_id, {"tags": ["home", "work"]})
+    assert task_service.tag_cache.get((user_id, "home")) is not None
+
+    task_service.update_task(user_id, task_id, {"tags": []})
+    with count_queries() as statements:
+        task_service.get_or_create_tag(user_id, "work")
+    assert statements == []
+
+    task_service.forget_user(user_id)
+    assert task_service.tag_cache.get((user_id, "work")) is None
+
+
+def test_tag_ids_are_not_cached_after_rollback(task_service, task):
+    task_service.tag_cache.clear()
+    task_service.get_or_create_tag(task.user_id, "discarded")
+    task_service.session.rollback()
+
+    assert task_service.tag_cache.get((task.user_id, "discarded")) is None
+    assert len(task_service.tag_cache) == 0
+
+
+def test_update_and_delete_do_not_load_the_task(task_service, task,
+                                                count_queries):
+    user_id, task_id = task.user_id, task.id
+
+    with count_queries() as statements:
+        updated = task_service.update_task(user_id, task_id, {"title": "New"})
+        task_service.delete_task(user_id, task_id)
+
+    assert updated["title"] == "New"
+    assert not [s for s in statements if s.startswith("SELECT tasks.")]
+    assert len([s for s in statements if s.startswith("UPDATE tasks")]) == 1
+
+
+def test_delete_locks_the_user_before_the_task(task_service, task,
+                                               count_queries):
+    user_id, task_id = task.user_id, task.id
+
+    with count_queries() as statements:
+        task_service.delete_task(user_id, task_id)
+
+    # Same lock order as updates, which cannot deadlock with this
+    assert statements[0].startswith("UPDATE users")
+
+
+def test_batch_locks_the_user_before_reading_targets(task_service, task,
+                                                     count_queries):
+    user_id, task_id = task.user_id, task.id
+
+    with count_queries() as statements:
+        task_service.apply_batch(user_id, [{"op": "delete", "id": task_id}])
+
+    # Targets are read once no concurrent write of the user can delete them
+    assert statements[0].startswith("UPDATE users")
+    assert statements[1].startswith("SELECT tasks.")
+
+
+def test_get_todo_with_etag(client: FlaskClient, existing_user_tokens: dict,
+                            alt_valid_access_token: str):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    created = client.post("/todos", json=task, headers=headers)
+    task_id = created.get_json()["id"]
+
+    response = client.get(f"/todos/{task_id}", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json() == created.get_json()
+    assert response.headers["ETag"] == created.headers["ETag"]
+
+    assert client.get("/todos/999999", headers=headers).status_code == 404
+    alt_headers = {"Authorization": f"Bearer {alt_valid_access_token}"}
+    assert client.get(f"/todos/{task_id}", headers=alt_headers).status_code == 403
+
+
+def test_update_todo_with_if_match(client: FlaskClient, existing_user_tokens: dict):
+    headers = {"Authorization": f"Bearer {existing_user_tokens['access_token']}"}
+    created = client.post("/todos", json=task, headers=headers)
+    task_id = created.get_json()["id"]
+    etag = created.headers["ETag"]
+
+    # First device updates the version it read
+    response = client.patch(f"/todos/{task_id}", json={"title": "First"},
+                            headers={**headers, "If-Match": etag})
+    assert response.status_code == 204
+    assert response.headers["ETag"] != etag
+
+    # Second device read the same version, its update is rejected
+    response = client.patch(f"/todos/{task_id}", json={"title": "Second"},
+                            headers={**headers, "If-Match": etag})
+    assert response.status_code == 412
+    assert client.get(f"/todos/{task_id}",
+                      headers=headers).get_json()["title"] == "First"
+
+    response = client.patch(f"/todos/{task_id}", json={"title": "Any"},
+                            headers={**headers, "If-Match": "*"})
+    assert response.status_code == 204
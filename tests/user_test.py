@@ -1,5 +1,8 @@
+from app import db
 from app.models import User
+from app.services.password_hasher import PasswordHasher
 from pytest import raises
+from werkzeug.security import generate_password_hash
 
 def test_email_validation():
     name = "Name"
@@ -18,3 +21,45 @@ def test_password_is_hashed():
     assert user.name == name
     assert user.email == email
     assert user.password != password
+
+def test_password_hasher_on_worker_processes():
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1)
+
+    try:
+        password_hash = hasher.hash("password123")
+        assert hasher.verify(password_hash, "password123")
+        assert not hasher.verify(password_hash, "wrong")
+    finally:
+        hasher.shutdown()
+
+    assert not hasher.needs_rehash(password_hash)
+    assert PasswordHasher(method="pbkdf2:sha256:2000").needs_rehash(password_hash)
+
+def test_password_hasher_prefix_without_hashing():
+    # Same parameters werkzeug writes, defaults filled in
+    for method in ("scrypt", "scrypt:16384:8:1", "pbkdf2", "pbkdf2:sha512"):
+        prefix = generate_password_hash("", method).split("$")[0]
+        assert not PasswordHasher(method=method).needs_rehash(prefix + "$salt$hash")
+
+    with raises(ValueError):
+        PasswordHasher(method="md5")
+
+def test_outdated_password_hash_is_upgraded_on_login(app, client, test_email):
+    old_hash = generate_password_hash("password123", "pbkdf2:sha256:1000")
+    with app.app_context():
+        db.session.add(User("Name", test_email, password_hash=old_hash))
+        db.session.commit()
+
+    response = client.post("/login", json={
+        "email": test_email, "password": "password123"
+    })
+    assert response.status_code == 200
+
+    with app.app_context():
+        user = db.session.query(User).filter_by(email=test_email).one()
+        assert user.password.startswith("scrypt:")
+
+    response = client.post("/login", json={
+        "email": test_email, "password": "password123"
+    })
+    assert response.status_code == 200